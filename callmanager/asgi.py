@@ -0,0 +1,7 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'callmanager.settings')
+# Частые читающие запросы – асинхронные представления (core/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', 'true')
+application = get_asgi_application()
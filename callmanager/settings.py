@@ -32,6 +32,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.callevents.CallEventMiddleware',
 ]
 
 ROOT_URLCONF = 'callmanager.urls'
@@ -53,14 +54,54 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'callmanager.wsgi.application'
+ASGI_APPLICATION = 'callmanager.asgi.application'
+
+# Асинхронные варианты частых читающих запросов (core/async_views.py).
+# callmanager/asgi.py включает их сам; под WSGI остаются синхронные.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
+# Профиль БД: DB_PROFILE=production включает WAL, настройки SQLite ниже,
+# постоянные подключения и отдельное подключение для чтения (core/db.py).
+# Каждый параметр можно задать в .env отдельно; пустое значение – не менять.
+DB_PROFILE = os.getenv('DB_PROFILE', 'default')
+_production_db = DB_PROFILE == 'production'
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # Сколько ждать освобождения блокировки, миллисекунды
+    'busy_timeout': '5000',
+    # Байты; отображение файла БД в память
+    'mmap_size': str(256 * 1024 * 1024),
+    # Отрицательное значение – размер в КиБ
+    'cache_size': '-65536',
+}
+SQLITE_PRAGMAS = {
+    name: os.getenv(f'SQLITE_{name.upper()}', value if _production_db else '')
+    for name, value in SQLITE_PRODUCTION_PRAGMAS.items()
+}
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600 if _production_db else 0)),
+        'CONN_HEALTH_CHECKS': _production_db,
     }
 }
 
+# Подключение только для чтения, на которое роутер отправляет читающие
+# эндпоинты. По умолчанию – тот же файл (в режиме WAL чтение не ждёт
+# записи); DB_READ_NAME может указывать на реплику.
+if os.getenv('DB_READ_CONNECTION', 'true' if _production_db else 'false').lower() == 'true':
+    DATABASES['readonly'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_READ_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db.ReadConnectionRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -84,4 +125,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/login/'
+
+# Поток уведомлений (Server-Sent Events)
+# Соединение потока живёт до NOTIFICATION_STREAM_TIMEOUT секунд. Под WSGI это
+# занятый рабочий поток на каждую открытую вкладку, поэтому по умолчанию поток
+# включён только под ASGI (ASYNC_VIEWS); иначе эндпоинт отвечает 204 и
+# браузер опрашивает /api/notifications/
+NOTIFICATION_STREAM_ENABLED = os.getenv('NOTIFICATION_STREAM_ENABLED', str(ASYNC_VIEWS)).lower() == 'true'
+# Время жизни одного соединения, после него браузер переподключается
+NOTIFICATION_STREAM_TIMEOUT = int(os.getenv('NOTIFICATION_STREAM_TIMEOUT', 55))
+# Максимальная пауза между проверками очереди звонков, секунды; больше
+# секунды не бывает (views.NOTIFICATION_STREAM_MAX_WAIT), меньше – по желанию
+NOTIFICATION_STREAM_RECHECK = float(os.getenv('NOTIFICATION_STREAM_RECHECK', 1))
+# Задержка переподключения браузера, миллисекунды
+NOTIFICATION_STREAM_RETRY_MS = int(os.getenv('NOTIFICATION_STREAM_RETRY_MS', 1000))
+
+# Планировщик наступивших звонков (manage.py run_call_scheduler)
+# Если включён, веб-процессы не сканируют очередь звонков сами, а забирают
+# готовые события из таблицы DueCallEvent
+CALL_SCHEDULER_ENABLED = os.getenv('CALL_SCHEDULER_ENABLED', 'false').lower() == 'true'
+CALL_SCHEDULER_HOST = os.getenv('CALL_SCHEDULER_HOST', '127.0.0.1')
+CALL_SCHEDULER_PORT = int(os.getenv('CALL_SCHEDULER_PORT', 8765))
+# Период полной пересборки очереди (страховка от потерянных датаграмм), секунды
+CALL_SCHEDULER_RESYNC = float(os.getenv('CALL_SCHEDULER_RESYNC', 300))
+
+# Кэш настроек пользователей (core/settings_cache.py)
+# Размер LRU в памяти процесса и время жизни записи в нём, секунды
+USER_SETTINGS_CACHE_SIZE = int(os.getenv('USER_SETTINGS_CACHE_SIZE', 1024))
+USER_SETTINGS_LOCAL_TTL = float(os.getenv('USER_SETTINGS_LOCAL_TTL', 30))
+# Псевдоним кэша Django для общего уровня (пусто – не использовать)
+USER_SETTINGS_SHARED_CACHE = os.getenv('USER_SETTINGS_SHARED_CACHE', '')
+USER_SETTINGS_SHARED_TTL = int(os.getenv('USER_SETTINGS_SHARED_TTL', 3600))
+
+# Рабочий календарь (core/workcalendar.py)
+# Рабочие часы, в которые переносятся перезвоны (если пользователь включил)
+WORK_DAY_START = os.getenv('WORK_DAY_START', '09:00')
+WORK_DAY_END = os.getenv('WORK_DAY_END', '18:00')
+# На сколько лет вперёд строится календарь рабочих дней
+WORK_CALENDAR_YEARS = int(os.getenv('WORK_CALENDAR_YEARS', 2))
+
+# Кэш Django. По умолчанию – в памяти процесса; для нескольких процессов
+# укажите общий бэкенд, например django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Страница справочника (core/helppage.py): псевдоним кэша и время жизни, секунды
+HELP_PAGE_CACHE = os.getenv('HELP_PAGE_CACHE', 'default')
+HELP_PAGE_CACHE_TTL = int(os.getenv('HELP_PAGE_CACHE_TTL', 3600))
+
+# Журнал событий звонков (core/callevents.py): размер буфера и сколько
+# секунд события могут ждать записи вне запросов
+CALL_EVENT_BUFFER_SIZE = int(os.getenv('CALL_EVENT_BUFFER_SIZE', 500))
+CALL_EVENT_FLUSH_INTERVAL = float(os.getenv('CALL_EVENT_FLUSH_INTERVAL', 5))
\ No newline at end of file
@@ -1,34 +1,67 @@
 from django.contrib import admin
+from django.contrib.auth.models import User
 from .models import (
     UserSettings, CallRecord, TrackingRecord, DailyTask, Note,
-    HelpTopic, HelpTab
+    HelpTopic, HelpTab, CallStat, DataVersion
 )
 
+
+class BumpsDataVersionAdmin(admin.ModelAdmin):
+    """
+    Правка данных оператора в админке увеличивает его версию данных, как
+    @bumps_data_version у представлений: иначе клиент получал бы 304 со
+    старыми данными. При смене владельца записи версия растёт у обоих.
+    """
+
+    def save_model(self, request, obj, form, change):
+        old_user_id = None
+        if change:
+            old_user_id = type(obj).objects.filter(pk=obj.pk).values_list('user_id', flat=True).first()
+        super().save_model(request, obj, form, change)
+        for user_id in {old_user_id, obj.user_id} - {None}:
+            DataVersion.bump(User(pk=user_id))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        DataVersion.bump(User(pk=obj.user_id))
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            DataVersion.bump(User(pk=user_id))
+
 @admin.register(UserSettings)
-class UserSettingsAdmin(admin.ModelAdmin):
+class UserSettingsAdmin(BumpsDataVersionAdmin):
     list_display = ('user', 'schedule_type', 'first_work_date', 'sound_enabled', 'volume', 'dark_theme')
     list_filter = ('schedule_type', 'sound_enabled', 'dark_theme')
     search_fields = ('user__username',)
 
 @admin.register(CallRecord)
-class CallRecordAdmin(admin.ModelAdmin):
+class CallRecordAdmin(BumpsDataVersionAdmin):
     list_display = ('id', 'user', 'phone', 'next_attempt', 'call_type')
     list_filter = ('user', 'call_type', 'attempt_number')
     search_fields = ('phone', 'comment')
 
 @admin.register(TrackingRecord)
-class TrackingRecordAdmin(admin.ModelAdmin):
+class TrackingRecordAdmin(BumpsDataVersionAdmin):
     list_display = ('id', 'user', 'claim', 'crm', 'connection_datetime', 'status')
     list_filter = ('user', 'status')
     search_fields = ('claim', 'crm')
 
 @admin.register(DailyTask)
-class DailyTaskAdmin(admin.ModelAdmin):
+class DailyTaskAdmin(BumpsDataVersionAdmin):
     list_display = ('user', 'date', 'task', 'completed')
     list_filter = ('user', 'date', 'completed')
     search_fields = ('task',)
 
-admin.site.register(Note)
+admin.site.register(Note, BumpsDataVersionAdmin)
+
+@admin.register(CallStat)
+class CallStatAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'call_type', 'added', 'attempts', 'completed', 'deleted')
+    list_filter = ('call_type', 'day')
+    search_fields = ('user__username',)
 
 @admin.register(HelpTopic)
 class HelpTopicAdmin(admin.ModelAdmin):
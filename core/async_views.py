@@ -0,0 +1,197 @@
+"""
+Асинхронные варианты частых читающих запросов для запуска под ASGI
+(callmanager/asgi.py): список звонков, заявки, заметка, уведомления и
+поток уведомлений. Параметры и ответы те же, что у представлений из
+views.py; разбор параметров, запросы и сериализация – общие.
+
+Пока запрос ждёт БД или спит между проверками потока уведомлений, он не
+занимает поток: один процесс держит сотни опросов и открытых потоков.
+"""
+import asyncio
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings as django_settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import views
+from .db import read_connection
+from .models import DataVersion, Note, TrackingRecord
+from .utils import BatchSerializer, format_sse, make_sync_cursor, parse_sync_cursor
+
+
+# ========== ДЕКОРАТОРЫ ==========
+
+def async_login_required(view):
+    """login_required для асинхронных представлений."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user ленивый и загружается запросом к БД – в потоке
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_conditional_on_data_version(time_dependent=False):
+    """Асинхронный вариант views.conditional_on_data_version."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            version = await DataVersion.objects.filter(user=request.user).values_list(
+                'version', flat=True
+            ).afirst()
+            res_etag = quote_etag(views.data_version_etag(request, version or 0, time_dependent))
+            response = get_conditional_response(request, etag=res_etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', res_etag)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# ========== ЗВОНКИ ==========
+
+async def stream_calls(rows, limit, sync_cursor, serializer):
+    """Асинхронный вариант views.stream_calls."""
+    stream = views.CallStream(limit, sync_cursor, serializer)
+    yield views.CallStream.HEAD
+    has_more = False
+    async for row in rows:
+        if stream.full():
+            has_more = True
+            break
+        part = stream.add(row)
+        if part:
+            yield part
+    yield stream.tail(has_more)
+
+
+@async_login_required
+@read_connection
+@async_conditional_on_data_version(time_dependent=True)
+async def get_calls(request):
+    """Список звонков пользователя; см. views.get_calls."""
+    now = timezone.now()
+    serializer = BatchSerializer(now)
+    try:
+        calls, since, limit = views.parse_calls_query(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    if since:
+        return await sync_to_async(views.delta_response)(
+            request.user, 'call', calls.values(*views.CALL_FIELDS), serializer.calls, 'calls', since, now
+        )
+
+    rows = calls.values(*views.CALL_FIELDS)
+    if limit is not None:
+        rows = rows[:limit + 1]
+
+    if limit is not None and limit <= views.CALLS_STREAM_THRESHOLD:
+        return views.calls_page_response([row async for row in rows], limit, now, serializer)
+
+    return StreamingHttpResponse(
+        stream_calls(rows.aiterator(chunk_size=views.CALLS_CHUNK_SIZE), limit, make_sync_cursor(now), serializer),
+        content_type='application/json'
+    )
+
+
+# ========== ЗАЯВКИ ==========
+
+@async_login_required
+@read_connection
+@async_conditional_on_data_version()
+async def get_tracking(request):
+    """Список заявок; см. views.get_tracking."""
+    now = timezone.now()
+    serializer = BatchSerializer(now)
+    tracking = TrackingRecord.objects.filter(user=request.user).order_by('id').values(*views.TRACKING_FIELDS)
+
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = parse_sync_cursor(since)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        return await sync_to_async(views.delta_response)(
+            request.user, 'tracking', tracking, serializer.tracking_list, 'tracking', since, now
+        )
+
+    data = serializer.tracking_list([row async for row in tracking])
+    return JsonResponse({'tracking': data, 'sync_cursor': make_sync_cursor(now)})
+
+
+# ========== ЗАМЕТКИ ==========
+
+@async_login_required
+@async_conditional_on_data_version()
+async def get_note(request):
+    note, _ = await Note.objects.aget_or_create(user=request.user)
+    return JsonResponse({'content': note.content, 'version': note.version})
+
+
+# ========== УВЕДОМЛЕНИЯ ==========
+
+async def collect_due_notifications(user, now):
+    """Асинхронный вариант views.collect_due_notifications (тот же захват)."""
+    if django_settings.CALL_SCHEDULER_ENABLED:
+        event_ids = [event_id async for event_id in views.due_events(user)]
+        if not event_ids:
+            return []
+        await views.claim_due_events(event_ids).aupdate(delivered_at=now)
+        rows = [row async for row in views.claimed_events(event_ids, now)]
+    else:
+        due_ids = [call_id async for call_id in views.due_calls(user, now)]
+        if not due_ids:
+            return []
+        await views.claim_due_calls(due_ids).aupdate(notified_at=now)
+        rows = [row async for row in views.claimed_calls(due_ids, now)]
+    return BatchSerializer(now).notifications(rows)
+
+
+@async_login_required
+async def get_notifications(request):
+    """Разовая проверка уведомлений; см. views.get_notifications (без @read_connection)."""
+    data = await collect_due_notifications(request.user, timezone.now())
+    return JsonResponse({'notifications': data})
+
+
+async def notification_events(user):
+    """Асинхронный вариант views.notification_events: спит, не занимая поток."""
+    deadline = time.monotonic() + django_settings.NOTIFICATION_STREAM_TIMEOUT
+    stream_wait = sync_to_async(views.notification_stream_wait)
+
+    yield f'retry: {django_settings.NOTIFICATION_STREAM_RETRY_MS}\n\n'
+    while True:
+        now = timezone.now()
+        data = await collect_due_notifications(user, now)
+        if data:
+            yield format_sse('notifications', {'notifications': data})
+
+        wait = await stream_wait(user, now, deadline)
+        if wait is None:
+            break
+        await asyncio.sleep(wait)
+        # Комментарий-пинг: держит прокси открытым и выявляет отключившихся клиентов
+        yield ': ping\n\n'
+
+
+@async_login_required
+async def notifications_stream(request):
+    """Поток уведомлений (Server-Sent Events); см. views.notifications_stream."""
+    if not django_settings.NOTIFICATION_STREAM_ENABLED:
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(notification_events(request.user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
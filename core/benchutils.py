@@ -0,0 +1,27 @@
+"""
+Общие помощники команд нагрузочного тестирования (bench, bench_asgi,
+bench_db_concurrency): статистика задержек и хост для запросов в процессе.
+"""
+from django.conf import settings
+from django.test import override_settings
+
+# Хост запросов, которые бенчмарки отправляют приложению в своём процессе
+HOST = 'localhost'
+
+
+def percentile(values, share):
+    """Значение, ниже которого лежит доля share выборки (0.5 – медиана)."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def allow_bench_host():
+    """
+    Контекст, в котором HOST входит в ALLOWED_HOSTS; после замера список
+    хостов возвращается к настройкам проекта.
+    """
+    if HOST in settings.ALLOWED_HOSTS:
+        return override_settings()
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST])
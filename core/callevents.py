@@ -0,0 +1,125 @@
+"""
+Журнал событий звонков (модель CallEvent).
+
+Представления не пишут события сразу, а кладут их в буфер потока –
+только после фиксации своей транзакции, чтобы в журнал не попала
+откатившаяся история. CallEventMiddleware в конце запроса записывает
+весь буфер одним bulk_create: сколько бы событий ни было, это одна
+дополнительная запись на запрос. Вне запросов (команды, планировщик)
+буфер сбрасывается при наполнении до CALL_EVENT_BUFFER_SIZE, если
+самому старому событию больше CALL_EVENT_FLUSH_INTERVAL секунд, и при
+выходе из процесса.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import CallEvent
+
+logger = logging.getLogger(__name__)
+
+
+def epoch_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+
+
+class EventBuffer(threading.local):
+    """
+    Буфер событий текущего потока. pending – сколько событий ждёт записи во
+    всех потоках процесса: по нему асинхронный код узнаёт, есть ли что
+    сбрасывать, не переходя в поток буфера.
+    """
+    pending = 0
+    _pending_lock = threading.Lock()
+
+    def __init__(self):
+        self.events = []
+        self.started = None
+
+    def extend(self, events):
+        if not self.events:
+            self.started = time.monotonic()
+        self.events.extend(events)
+        self._count(len(events))
+        if (len(self.events) >= settings.CALL_EVENT_BUFFER_SIZE
+                or time.monotonic() - self.started >= settings.CALL_EVENT_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        if not self.events:
+            return 0
+        events, self.events = self.events, []
+        self._count(-len(events))
+        try:
+            CallEvent.objects.bulk_create(events, batch_size=settings.CALL_EVENT_BUFFER_SIZE)
+        except DatabaseError:
+            # Изменения звонков уже зафиксированы; из-за журнала их не откатываем
+            logger.exception('Не удалось записать %d событий звонков', len(events))
+            return 0
+        return len(events)
+
+    @classmethod
+    def _count(cls, n):
+        with cls._pending_lock:
+            cls.pending += n
+
+
+buffer = EventBuffer()
+atexit.register(lambda: buffer.flush())
+
+
+def log_call_events(user, calls, code, now=None):
+    """
+    Ставит в буфер событие code для каждого звонка из calls (номер попытки
+    и тип берутся из звонка). В буфер события попадают после фиксации транзакции.
+    """
+    at = epoch_ms(now or timezone.now())
+    events = [
+        CallEvent(user_id=user.pk, call_id=call.pk, code=code, attempt=call.attempt_number,
+                  call_type=CallEvent.CALL_TYPE_CODES[call.call_type], at=at)
+        for call in calls
+    ]
+    if events:
+        transaction.on_commit(lambda: buffer.extend(events))
+
+
+class CallEventMiddleware:
+    """
+    Записывает накопленные за запрос события одним запросом к БД.
+    Работает и под ASGI, не переводя цепочку обработки в синхронный режим.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            buffer.flush()
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            # Асинхронный ORM пишет в потоке запроса – там же и буфер. Пустой
+            # буфер (большинство запросов, поток уведомлений) не стоит перехода в поток
+            if EventBuffer.pending:
+                await sync_to_async(buffer.flush)()
@@ -0,0 +1,124 @@
+"""
+Дневные счётчики звонков (модель CallStat).
+
+Изменяющие представления накапливают приращения в CallStatDelta и
+записывают их вызовом save() в своей транзакции: одна строка на
+(пользователь, день, тип звонка), одно UPDATE на тип. День – местная
+дата события.
+
+Попытки относятся к типу звонка после отметки «недозвон» (Перезвон или
+Исчерпан). Каждое приращение сопровождается событием журнала CallEvent с
+тем же типом звонка, поэтому перестроение (manage.py rebuild_call_stats)
+пересчитывает все счётчики за период с нуля по журналу.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .callevents import epoch_ms, from_epoch_ms
+from .models import CallEvent, CallStat
+from .utils import local_day_bounds
+
+STAT_FIELDS = ('added', 'attempts', 'completed', 'deleted', 'success_attempts')
+# Какой счётчик увеличивает событие журнала
+EVENT_FIELDS = {
+    CallEvent.ADDED: 'added',
+    CallEvent.NO_ANSWER: 'attempts',
+    CallEvent.EXHAUSTED: 'attempts',
+    CallEvent.COMPLETED: 'completed',
+    CallEvent.DELETED: 'deleted',
+}
+
+
+class CallStatDelta:
+    """Приращения счётчиков одного пользователя: {тип звонка: Counter}."""
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+
+    def add(self, call_type, field, n=1):
+        self.counts[call_type][field] += n
+
+    def added(self, call_types):
+        for call_type, n in Counter(call_types).items():
+            self.add(call_type, 'added', n)
+
+    def attempts(self, calls):
+        for call in calls:
+            self.add(call.call_type, 'attempts')
+
+    def completed(self, call):
+        self.add(call.call_type, 'completed')
+        self.add(call.call_type, 'success_attempts', call.attempt_number)
+
+    def deleted(self, calls):
+        """calls – queryset звонков до удаления."""
+        for row in calls.order_by().values('call_type').annotate(n=Count('id')):
+            self.add(row['call_type'], 'deleted', row['n'])
+
+    def save(self, user, now=None):
+        day = timezone.localdate(now)
+        for call_type, counts in self.counts.items():
+            counts = {field: n for field, n in counts.items() if n}
+            if counts:
+                _increment(user, day, call_type, counts)
+        self.counts.clear()
+
+
+def _increment(user, day, call_type, counts):
+    stats = CallStat.objects.filter(user=user, day=day, call_type=call_type)
+    updates = {field: F(field) + n for field, n in counts.items()}
+    if stats.update(**updates):
+        return
+    # Первое событие за день: строки ещё нет (или её только что создал соседний запрос)
+    _, created = CallStat.objects.get_or_create(user=user, day=day, call_type=call_type, defaults=counts)
+    if not created:
+        stats.update(**updates)
+
+
+def rebuild(date_from=None, date_to=None, users=None):
+    """
+    Пересчитывает статистику за период с нуля по журналу событий: строки
+    периода удаляются и собираются заново в одной транзакции. Возвращает
+    (записано строк, пропущено событий) – пропускаются события без типа
+    звонка (записанные до его появления в журнале по уже удалённым звонкам).
+
+    События, которые ещё ждут записи в буфере процесса (core/callevents.py),
+    в пересчёт не попадут, поэтому сегодняшний день лучше перестраивать,
+    когда операторы не работают.
+    """
+    events = CallEvent.objects.filter(code__in=EVENT_FIELDS).order_by()
+    stats = CallStat.objects.all()
+    if users is not None:
+        events = events.filter(user__in=users)
+        stats = stats.filter(user__in=users)
+    if date_from:
+        events = events.filter(at__gte=epoch_ms(local_day_bounds(date_from)[0]))
+        stats = stats.filter(day__gte=date_from)
+    if date_to:
+        events = events.filter(at__lt=epoch_ms(local_day_bounds(date_to)[1]))
+        stats = stats.filter(day__lte=date_to)
+
+    with transaction.atomic():
+        # Сначала удаление: оно берёт блокировку записи, и новые приращения
+        # представлений ждут конца пересчёта, а не теряются в нём
+        stats.delete()
+        totals = defaultdict(Counter)
+        skipped = 0
+        rows = events.values_list('user_id', 'code', 'call_type', 'attempt', 'at')
+        for user_id, code, call_type, attempt, at in rows.iterator(chunk_size=5000):
+            call_type = CallEvent.CALL_TYPE_NAMES.get(call_type)
+            if call_type is None:
+                skipped += 1
+                continue
+            counts = totals[user_id, timezone.localdate(from_epoch_ms(at)), call_type]
+            counts[EVENT_FIELDS[code]] += 1
+            if code == CallEvent.COMPLETED:
+                counts['success_attempts'] += attempt
+        CallStat.objects.bulk_create([
+            CallStat(user_id=user_id, day=day, call_type=call_type, **counts)
+            for (user_id, day, call_type), counts in totals.items()
+        ], batch_size=500)
+    return len(totals), skipped
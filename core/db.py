@@ -0,0 +1,133 @@
+"""
+Настройка подключений к БД.
+
+1. Каждое новое подключение к SQLite получает PRAGMA из SQLITE_PRAGMAS
+   (режим журнала, synchronous, ожидание блокировки, mmap, кэш страниц).
+   Подключение для чтения дополнительно переводится в query_only.
+
+2. ReadConnectionRouter отправляет чтения эндпоинтов, помеченных
+   декоратором @read_connection, на подключение READ_ALIAS (если оно
+   настроено). Как только такой эндпоинт что-то записал, его дальнейшие
+   чтения идут в основное подключение – чтобы видеть свою же запись даже
+   при отстающей реплике. Тело потокового ответа читается уже после
+   возврата из представления, поэтому декоратор оборачивает его итератор
+   и восстанавливает то же состояние на время выдачи каждой части.
+"""
+import contextvars
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+READ_ALIAS = 'readonly'
+
+# Состояние текущего запроса для роутера; None – эндпоинт не помечен
+_read_state = contextvars.ContextVar('read_state', default=None)
+
+# PRAGMA, которые меняют файл БД, а не подключение: на чтении не нужны
+_WRITE_PRAGMAS = ('journal_mode',)
+
+
+def sqlite_pragma_statements(pragmas, read_only=False):
+    statements = []
+    for name, value in pragmas.items():
+        if value == '' or (read_only and name in _WRITE_PRAGMAS):
+            continue
+        statements.append(f'PRAGMA {name} = {value}')
+    if read_only:
+        statements.append('PRAGMA query_only = ON')
+    return statements
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик сигнала connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    statements = sqlite_pragma_statements(settings.SQLITE_PRAGMAS, read_only=connection.alias == READ_ALIAS)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _iter_with_state(iterator, state):
+    iterator = iter(iterator)
+    while True:
+        token = _read_state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_state.reset(token)
+        yield chunk
+
+
+async def _aiter_with_state(iterator, state):
+    iterator = aiter(iterator)
+    while True:
+        token = _read_state.set(state)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _read_state.reset(token)
+        yield chunk
+
+
+def _keep_state(response, state):
+    """Чтения при выдаче тела потокового ответа идут туда же, куда шли в представлении."""
+    if getattr(response, 'streaming', False):
+        wrap = _aiter_with_state if response.is_async else _iter_with_state
+        response.streaming_content = wrap(response.streaming_content, state)
+    return response
+
+
+def read_connection(view):
+    """
+    Чтения представления идут на подключение только для чтения.
+    Подходит и для асинхронных представлений: состояние в contextvar
+    переходит в потоки асинхронного ORM вместе с контекстом.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = {'wrote': False}
+            token = _read_state.set(state)
+            try:
+                return _keep_state(await view(request, *args, **kwargs), state)
+            finally:
+                _read_state.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = {'wrote': False}
+        token = _read_state.set(state)
+        try:
+            return _keep_state(view(request, *args, **kwargs), state)
+        finally:
+            _read_state.reset(token)
+    return wrapper
+
+
+class ReadConnectionRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _read_state.get()
+        if state is None or state['wrote'] or READ_ALIAS not in connections.settings:
+            return None
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _read_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_ALIAS
@@ -0,0 +1,117 @@
+"""
+Потоковая выгрузка звонков, заявок и задач в CSV или JSON Lines.
+
+Записи читаются короткими запросами по ключу id (id > последнего
+выданного), а не одним долгим курсором: каждый запрос сразу освобождает
+БД, поэтому выгрузка за год по всем пользователям не держит блокировку
+SQLite и не мешает операторам писать. Память постоянна – в ней только
+одна порция строк.
+"""
+import csv
+import json
+from datetime import datetime, date, timedelta
+
+from django.utils import timezone
+
+from .models import CallRecord, DailyTask, TrackingRecord
+
+# Сколько записей читать одним запросом
+EXPORT_CHUNK_SIZE = 2000
+
+# Вид выгрузки -> (модель, поле для фильтра по датам, столбцы)
+EXPORTS = {
+    'calls': (CallRecord, 'first_attempt', (
+        'id', 'user__username', 'comment', 'phone', 'call_type', 'attempt_number',
+        'first_attempt', 'next_attempt', 'created_at',
+    )),
+    'tracking': (TrackingRecord, 'connection_datetime', (
+        'id', 'user__username', 'claim', 'phone', 'crm', 'connection_datetime',
+        'status', 'completed', 'call_record_id',
+    )),
+    'tasks': (DailyTask, 'date', (
+        'id', 'user__username', 'date', 'task', 'completed',
+    )),
+}
+
+FORMATS = ('csv', 'jsonl')
+
+
+def _column_name(field):
+    return 'user' if field == 'user__username' else field
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def build_queryset(kind, username=None, date_from=None, date_to=None):
+    """
+    Queryset выгрузки с фильтрами. date_from и date_to – даты включительно;
+    для полей-дат-времени граница берётся по местному времени.
+    """
+    model, date_field, _ = EXPORTS[kind]
+    queryset = model.objects.all()
+    if username:
+        queryset = queryset.filter(user__username=username)
+
+    is_datetime = model._meta.get_field(date_field).get_internal_type() == 'DateTimeField'
+    tz = timezone.get_default_timezone()
+    if date_from:
+        start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()), tz) if is_datetime else date_from
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if date_to:
+        if is_datetime:
+            end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()), tz)
+            queryset = queryset.filter(**{f'{date_field}__lt': end})
+        else:
+            queryset = queryset.filter(**{f'{date_field}__lte': date_to})
+    return queryset
+
+
+def iter_records(kind, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Выдаёт словари записей порциями по первичному ключу."""
+    _, _, fields = EXPORTS[kind]
+    columns = [_column_name(f) for f in fields]
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        for row in chunk:
+            yield dict(zip(columns, (_format_value(v) for v in row)))
+        last_id = chunk[-1][0]
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _buffered(lines, size=500):
+    """Склеивает строки в крупные куски, чтобы не писать в сокет по строке."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) == size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(kind, records):
+    _, _, fields = EXPORTS[kind]
+    writer = csv.writer(_Echo(), delimiter=';')
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей без искажений
+    yield '\ufeff' + writer.writerow([_column_name(f) for f in fields])
+    yield from _buffered(writer.writerow(record.values()) for record in records)
+
+
+def stream_jsonl(records):
+    yield from _buffered(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
@@ -0,0 +1,47 @@
+"""
+Кэш отрисованной страницы справочника.
+
+Аккордеон тем со всеми вкладками рендерится один раз на версию
+справочника и хранится в кэше HELP_PAGE_CACHE под ключом с этой версией.
+Любое изменение тем и вкладок (страницы администратора справочника,
+админка Django) увеличивает версию через сигналы в models.py, и
+следующий запрос отрисует аккордеон заново. Старые версии просто
+вытесняются из кэша по времени жизни.
+
+Версия хранится в БД (модель HelpVersion) и меняется в транзакции самой
+правки, поэтому новую страницу сразу видят все процессы – и с общим
+кэшем, и с кэшем в памяти каждого процесса. Цена – один запрос по
+первичному ключу на показ справочника.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def _cache():
+    return caches[settings.HELP_PAGE_CACHE]
+
+
+def get_help_version():
+    from .models import HelpVersion
+    return HelpVersion.current()
+
+
+def bump_help_version():
+    """Сбрасывает страницу: новая версия видна вместе с фиксацией правки."""
+    from .models import HelpVersion
+    HelpVersion.bump()
+
+
+def render_help_accordion():
+    """HTML аккордеона тем справочника из кэша (при промахе – рендер)."""
+    key = f'core:help_page:{get_help_version()}'
+    html = _cache().get(key)
+    if html is None:
+        from .models import HelpTopic
+
+        topics = HelpTopic.objects.filter(is_active=True).prefetch_related('tabs').order_by('order')
+        html = render_to_string('help/accordion.html', {'topics': topics})
+        _cache().set(key, html, settings.HELP_PAGE_CACHE_TTL)
+    return mark_safe(html)
@@ -0,0 +1,157 @@
+"""
+Полнотекстовый поиск по справочнику.
+
+На SQLite используется виртуальная таблица FTS5 (создаётся миграцией):
+одна строка на вкладку, rowid = id вкладки, столбцы – название темы,
+название вкладки и текст. Индекс обновляется точечно сигналами моделей
+HelpTopic и HelpTab (models.py), поэтому запрос – это поиск по
+инвертированному индексу с ранжированием bm25, а не перебор текстов.
+
+На других СУБД поиск сводится к icontains без ранжирования.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+FTS_TABLE = 'core_help_fts'
+SEARCH_LIMIT = 20
+
+# Маркеры подсветки в snippet(): управляющие символы, которых нет в тексте,
+# чтобы текст можно было экранировать, а потом заменить их на <mark>
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+# Веса столбцов в bm25: тема, вкладка, текст
+_BM25_WEIGHTS = '5.0, 3.0, 1.0'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Превращает ввод оператора в запрос FTS5: каждое слово – префикс,
+    все слова обязательны. Кавычки и операторы FTS5 из ввода не проходят.
+    """
+    words = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _highlight(fragment):
+    return (
+        escape(fragment)
+        .replace(_MARK_OPEN, '<mark>')
+        .replace(_MARK_CLOSE, '</mark>')
+    )
+
+
+def index_tabs(tab_ids):
+    """Переиндексирует вкладки (новые, изменённые или сменившие тему)."""
+    if not fts_available() or not tab_ids:
+        return
+    tab_ids = list(tab_ids)
+    placeholders = ', '.join(['%s'] * len(tab_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', tab_ids)
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, topic_title, title, content) '
+            f'SELECT t.id, p.title, t.title, t.content '
+            f'FROM core_helptab t JOIN core_helptopic p ON p.id = t.topic_id '
+            f'WHERE t.id IN ({placeholders})',
+            tab_ids
+        )
+
+
+def index_topic(topic_id):
+    """Переиндексирует все вкладки темы (например, после смены названия)."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id FROM core_helptab WHERE topic_id = %s', [topic_id])
+        tab_ids = [row[0] for row in cursor.fetchall()]
+    index_tabs(tab_ids)
+
+
+def remove_tabs(tab_ids):
+    if not fts_available() or not tab_ids:
+        return
+    tab_ids = list(tab_ids)
+    placeholders = ', '.join(['%s'] * len(tab_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', tab_ids)
+
+
+def rebuild_index():
+    """Полностью перестраивает индекс по таблицам справочника."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, topic_title, title, content) '
+            f'SELECT t.id, p.title, t.title, t.content '
+            f'FROM core_helptab t JOIN core_helptopic p ON p.id = t.topic_id'
+        )
+
+
+def search(text, limit=SEARCH_LIMIT):
+    """
+    Ищет активные вкладки активных тем. Возвращает список словарей с id
+    темы и вкладки, названиями (с подсветкой) и фрагментом текста.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    if not fts_available():
+        return _search_fallback(text, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT t.id, t.topic_id, '
+            f"highlight({FTS_TABLE}, 0, %s, %s), "
+            f"highlight({FTS_TABLE}, 1, %s, %s), "
+            f"snippet({FTS_TABLE}, 2, %s, %s, '…', 16) "
+            f'FROM {FTS_TABLE} f '
+            f'JOIN core_helptab t ON t.id = f.rowid '
+            f'JOIN core_helptopic p ON p.id = t.topic_id '
+            f'WHERE {FTS_TABLE} MATCH %s AND t.is_active AND p.is_active '
+            f'ORDER BY bm25({FTS_TABLE}, {_BM25_WEIGHTS}) '
+            f'LIMIT %s',
+            [_MARK_OPEN, _MARK_CLOSE] * 3 + [match, limit]
+        )
+        rows = cursor.fetchall()
+
+    return [
+        {
+            'tab_id': tab_id,
+            'topic_id': topic_id,
+            'topic': _highlight(topic_title),
+            'title': _highlight(title),
+            'snippet': _highlight(snippet),
+        }
+        for tab_id, topic_id, topic_title, title, snippet in rows
+    ]
+
+
+def _search_fallback(text, limit):
+    from django.db.models import Q
+
+    from .models import HelpTab
+
+    tabs = HelpTab.objects.filter(is_active=True, topic__is_active=True).select_related('topic')
+    for word in re.findall(r'\w+', text):
+        tabs = tabs.filter(
+            Q(title__icontains=word) | Q(content__icontains=word) | Q(topic__title__icontains=word)
+        )
+    return [
+        {
+            'tab_id': tab.id,
+            'topic_id': tab.topic_id,
+            'topic': escape(tab.topic.title),
+            'title': escape(tab.title),
+            'snippet': escape(tab.content[:200]),
+        }
+        for tab in tabs[:limit]
+    ]
@@ -0,0 +1,270 @@
+"""
+Потоковый импорт звонков из CSV или XLSX.
+
+Файл читается построчно, строки проверяются и копятся в пачку фиксированного
+размера, которая записывается пакетным INSERT. Весь импорт идёт в одной
+транзакции, поэтому память не зависит от размера файла, а ошибка записи не
+оставляет половину данных.
+
+Пачки пишутся многострочным INSERT … RETURNING id, а не bulk_create:
+bulk_create готовит каждое поле каждой модели отдельно и импортирует в
+несколько раз медленнее, тогда как здесь одинаковые даты (время импорта,
+время первой попытки) приводятся к формату БД один раз на весь файл.
+RETURNING отдаёт id вставленных строк, по ним следом за пачкой пишутся
+события ADDED для журнала – без чтения созданных звонков обратно и без
+догадок о том, какие id получила пачка.
+
+Ожидаемые столбцы (по заголовку первой строки, регистр не важен):
+комментарий / comment, телефон / phone, тип / call_type,
+время перезвона / next_attempt. Обязательны только комментарий и телефон.
+"""
+import csv
+import io
+import zipfile
+from array import array
+from datetime import datetime
+
+from django.conf import settings as django_settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .callevents import epoch_ms
+from .callstats import CallStatDelta
+from .models import CallEvent, CallRecord, DataVersion
+from .settings_cache import get_settings_snapshot
+from .scheduler import notify_scheduler
+from .utils import ceil_to_minute, normalize_phone, parse_datetime
+from .workcalendar import shift_to_work_time
+
+# Сколько строк копить в пачку
+IMPORT_BATCH_SIZE = 1000
+# Сколько строк в одном INSERT: 5000 параметров – в пределах лимита SQLite
+# (32766 с версии 3.32) и PostgreSQL
+INSERT_ROWS = 500
+# Сколько ошибок хранить подробно; остальные только считаются
+MAX_REPORTED_ERRORS = 1000
+# Типы, которые можно импортировать (как в форме добавления звонка)
+IMPORT_CALL_TYPES = ('Недозвон', 'Перезвон')
+
+COLUMN_ALIASES = {
+    'comment': 'comment', 'комментарий': 'comment',
+    'phone': 'phone', 'телефон': 'phone',
+    'call_type': 'call_type', 'тип': 'call_type',
+    'next_attempt': 'next_attempt', 'время перезвона': 'next_attempt',
+}
+
+
+class ImportResult:
+    """Итог импорта: число созданных записей и ошибки по строкам."""
+
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def iter_csv_rows(binary_file):
+    """
+    Построчно читает CSV (UTF-8, разделитель «;» или «,»). Повреждённый
+    файл или другая кодировка – ValueError, как и прочие ошибки файла.
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    reader = None
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        yield from reader
+    except UnicodeDecodeError:
+        raise ValueError('Файл CSV должен быть в кодировке UTF-8')
+    except csv.Error as e:
+        raise ValueError(f'Строка {reader.line_num if reader else 1}: файл CSV повреждён ({e})')
+
+
+def iter_xlsx_rows(binary_file):
+    """Построчно читает первый лист XLSX (нужен openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Для импорта XLSX установите пакет openpyxl')
+    try:
+        workbook = load_workbook(binary_file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError):
+        raise ValueError('Файл не похож на книгу Excel (.xlsx)')
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(binary_file, filename):
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(binary_file)
+    if filename.lower().endswith('.csv'):
+        return iter_csv_rows(binary_file)
+    raise ValueError('Поддерживаются только файлы .csv и .xlsx')
+
+
+def _cell_to_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel хранит телефоны как числа
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_next_attempt(value):
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.get_default_timezone())
+        return value
+    return parse_datetime(_cell_to_str(value))
+
+
+def build_call(values, default_next_attempt):
+    """
+    Проверяет строку и возвращает кортеж (comment, phone, call_type, next_attempt).
+    Время следующей попытки считается так же, как в add_call.
+    """
+    comment = _cell_to_str(values.get('comment'))
+    phone = _cell_to_str(values.get('phone'))
+    call_type = _cell_to_str(values.get('call_type')) or 'Недозвон'
+    next_attempt_raw = values.get('next_attempt')
+
+    if not comment or not phone:
+        raise ValueError('Заполните комментарий и телефон')
+    if len(comment) > 255:
+        raise ValueError('Комментарий длиннее 255 символов')
+    normalized = normalize_phone(phone)
+    if normalized is None:
+        raise ValueError(f'Неверный формат телефона: {phone}')
+    if call_type not in IMPORT_CALL_TYPES:
+        raise ValueError(f'Неизвестный тип звонка: {call_type}')
+
+    if call_type == 'Недозвон' or not _cell_to_str(next_attempt_raw):
+        next_attempt = default_next_attempt
+    else:
+        next_attempt = ceil_to_minute(_parse_next_attempt(next_attempt_raw))
+    return comment, normalized, call_type, next_attempt
+
+
+class CallInserter:
+    """Пакетная вставка звонков одного пользователя с общим временем импорта."""
+
+    FIELDS = ('user', 'comment', 'phone', 'first_attempt', 'next_attempt',
+              'attempt_number', 'call_type', 'notified_at', 'created_at', 'updated_at')
+    EVENT_FIELDS = ('user', 'call_id', 'code', 'attempt', 'call_type', 'at')
+
+    def __init__(self, user, now):
+        meta = CallRecord._meta
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(meta.get_field(name).column) for name in self.FIELDS)
+        self.sql_head = f'INSERT INTO {qn(meta.db_table)} ({columns}) VALUES '
+        self.sql_row = '(' + ', '.join(['%s'] * len(self.FIELDS)) + ')'
+        self.sql_tail = f' RETURNING {qn(meta.pk.column)}, {qn(meta.get_field("call_type").column)}'
+        self._sql = {}
+        event_columns = ', '.join(qn(CallEvent._meta.get_field(name).column) for name in self.EVENT_FIELDS)
+        event_placeholders = ', '.join(['%s'] * len(self.EVENT_FIELDS))
+        self.events_sql = (
+            f'INSERT INTO {qn(CallEvent._meta.db_table)} ({event_columns}) VALUES ({event_placeholders})'
+        )
+        self.user_id = user.pk
+        self.now_db = self.adapt(now)
+        self.now_ms = epoch_ms(now)
+        self._adapted = {}
+
+    @staticmethod
+    def adapt(dt):
+        return connection.ops.adapt_datetimefield_value(dt)
+
+    def row(self, comment, phone, call_type, next_attempt):
+        next_db = self._adapted.get(next_attempt)
+        if next_db is None:
+            next_db = self._adapted[next_attempt] = self.adapt(next_attempt)
+        return (self.user_id, comment, phone, self.now_db, next_db,
+                1, call_type, None, self.now_db, self.now_db)
+
+    def insert_sql(self, count):
+        sql = self._sql.get(count)
+        if sql is None:
+            sql = self._sql[count] = self.sql_head + ', '.join([self.sql_row] * count) + self.sql_tail
+        return sql
+
+    def insert(self, rows):
+        """Записывает пачку и события ADDED к ней; возвращает id вставленных звонков."""
+        returned = []
+        with connection.cursor() as cursor:
+            for i in range(0, len(rows), INSERT_ROWS):
+                chunk = rows[i:i + INSERT_ROWS]
+                cursor.execute(self.insert_sql(len(chunk)), [value for row in chunk for value in row])
+                returned.extend(cursor.fetchall())
+            cursor.executemany(self.events_sql, [
+                (self.user_id, call_id, CallEvent.ADDED, 1, CallEvent.CALL_TYPE_CODES[call_type], self.now_ms)
+                for call_id, call_type in returned
+            ])
+        return [call_id for call_id, _ in returned]
+
+
+def import_calls(user, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Импортирует звонки пользователя из итератора строк (первая – заголовок).
+    Возвращает ImportResult; строки с ошибками пропускаются.
+    """
+    result = ImportResult()
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        result.add_error(1, 'Файл пуст')
+        return result
+    columns = [COLUMN_ALIASES.get(_cell_to_str(h).lower()) for h in header]
+    if 'comment' not in columns or 'phone' not in columns:
+        result.add_error(1, 'В заголовке нет столбцов «Комментарий» и «Телефон»')
+        return result
+
+    settings = get_settings_snapshot(user)
+    now = timezone.now()
+    default_next_attempt = shift_to_work_time(settings, settings.retry_policy.next_attempt(1, now))
+    inserter = CallInserter(user, now)
+
+    batch = []
+    created_ids = array('q')
+    stats = CallStatDelta()
+    with transaction.atomic():
+        for line, row in enumerate(rows, start=2):
+            if not any(_cell_to_str(v) for v in row):
+                continue
+            values = {col: v for col, v in zip(columns, row) if col}
+            try:
+                comment, phone, call_type, next_attempt = build_call(values, default_next_attempt)
+                batch.append(inserter.row(comment, phone, call_type, next_attempt))
+                stats.add(call_type, 'added')
+            except ValueError as e:
+                result.add_error(line, str(e))
+                continue
+            if len(batch) == batch_size:
+                created_ids.extend(inserter.insert(batch))
+                batch = []
+        if batch:
+            created_ids.extend(inserter.insert(batch))
+        stats.save(user, now)
+    result.created = len(created_ids)
+
+    if result.created:
+        DataVersion.bump(user)
+    if result.created and django_settings.CALL_SCHEDULER_ENABLED:
+        for i in range(0, len(created_ids), IMPORT_BATCH_SIZE):
+            notify_scheduler(*created_ids[i:i + IMPORT_BATCH_SIZE])
+    return result
@@ -0,0 +1,507 @@
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import urls
+from core.benchutils import HOST, allow_bench_host, percentile
+from core.models import HelpTab, HelpTopic
+
+
+# Вкладки интерфейса и запрос данных, который делает вкладка после загрузки
+TABS = {
+    'tab_calls': ('get_calls', '?limit=50'),
+    'tab_tracking': ('get_tracking', ''),
+    'tab_schedule': ('get_schedule', ''),
+    'tab_notes': ('get_note', ''),
+    'tab_settings': ('get_settings', ''),
+}
+
+# Вероятности действий оператора за один период опроса
+TAB_SWITCH_SHARE = 0.15
+ADD_CALL_SHARE = 0.05
+NO_ANSWER_SHARE = 0.10
+
+# По какой задержке сравнивать с базовой линией: обход даёт лишь --repeat
+# замеров на URL, и p95 по ним – это шум; у смешанной нагрузки замеров много
+REGRESSION_METRIC = {'sweep': 'p50_ms', 'mix': 'p95_ms'}
+# Рост задержки меньше этого не считается регрессией
+MIN_REGRESSION_MS = 5.0
+
+IMPORT_CSV = 'comment,phone,call_type\n' + ''.join(
+    f'Импорт {n},+7999000{n:04d},Недозвон\n' for n in range(20)
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк эндпоинтов: сначала каждый URL из core/urls.py вызывается '
+        '--repeat раз, затем --operators операторов работают --seconds секунд '
+        '(опрос раз в --interval секунд, переключение вкладок, добавление звонков, '
+        'отметки «недозвон»). Выводит p50/p95/p99, запросы к БД на запрос и '
+        'пропускную способность; --save сохраняет базовую линию, --compare '
+        'сравнивает с ней и завершается ошибкой при регрессии. Данные готовит '
+        'manage.py seed_load. По умолчанию запросы идут через тестовый клиент '
+        'Django в процессе; --server – к запущенному серверу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=20, help='Одновременно работающих операторов')
+        parser.add_argument('--seconds', type=float, default=30, help='Длительность смешанной нагрузки')
+        parser.add_argument('--interval', type=float, default=2.0, help='Период опроса одного оператора, секунды')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз вызвать каждый URL при обходе')
+        parser.add_argument('--prefix', default='load_op', help='Префикс логинов операторов (как у seed_load)')
+        parser.add_argument('--password', default='load', help='Пароль операторов для входа на --server')
+        parser.add_argument('--server', help='Адрес запущенного сервера, например http://127.0.0.1:8000')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора действий операторов')
+        parser.add_argument('--save', metavar='PATH', help='Сохранить результат как базовую линию (JSON)')
+        parser.add_argument('--compare', metavar='PATH', help='Сравнить с сохранённой базовой линией')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост задержки и падение пропускной способности (доля)')
+
+    def handle(self, *args, **options):
+        if options['server']:
+            self.transport = lambda: ServerTransport(options['server'])
+            self.run(options)
+        else:
+            self.transport = ClientTransport
+            with allow_bench_host():
+                self.run(options)
+
+    def run(self, options):
+        self.options = options
+
+        operators = list(User.objects.filter(
+            username__in=[f'{options["prefix"]}{n}' for n in range(options['operators'])]
+        ).order_by('id'))
+        if len(operators) < options['operators']:
+            raise CommandError(
+                f'Операторов {options["prefix"]}* найдено {len(operators)} из {options["operators"]}: '
+                f'сначала выполните manage.py seed_load --operators {options["operators"]}'
+            )
+
+        self.check_coverage()
+        sweep = Stats()
+        self.sweep(sweep, operators[0])
+        mix = Stats()
+        started = time.monotonic()
+        self.mix(mix, operators)
+        seconds = time.monotonic() - started
+        requests = mix.count()
+        result = {
+            'created': timezone.now().isoformat(),
+            'transport': 'server' if options['server'] else 'client',
+            'options': {
+                name: options[name]
+                for name in ('operators', 'seconds', 'interval', 'repeat', 'prefix', 'server', 'seed')
+            },
+            'requests': requests,
+            'errors': mix.errors(),
+            'throughput': round(requests / seconds, 2),
+            'sweep': sweep.result(),
+            'mix': mix.result(),
+        }
+        self.report(result)
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Базовая линия сохранена: {options["save"]}')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.compare(baseline, result, options['threshold'])
+
+    def login(self, user):
+        session = self.transport()
+        session.login(user, self.options['password'])
+        return session
+
+    def check_coverage(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        missing = names - set(SWEEP_NAMES)
+        if missing:
+            self.stderr.write(self.style.WARNING(f'Не покрыты обходом: {", ".join(sorted(missing))}'))
+
+    # ---------- обход всех URL ----------
+
+    def sweep(self, stats, operator):
+        """
+        Каждый URL по --repeat раз. Чтения – от имени оператора с данными
+        seed_load; записи и админка – от служебного сотрудника, чьи данные
+        обход сам создаёт и удаляет.
+        """
+        admin, created = User.objects.get_or_create(
+            username=f'{self.options["prefix"]}_bench', defaults={'is_staff': True}
+        )
+        if created or not admin.check_password(self.options['password']):
+            admin.set_password(self.options['password'])
+            admin.save()
+        reader = self.login(operator)
+        writer = self.login(admin)
+        today = timezone.localdate()
+        later = timezone.localtime() + timedelta(hours=1)
+
+        def call(session, name, method='GET', query='', data=None, files=None, first_chunk=False):
+            return stats.request(session, name, method, reverse(name) + query, data, files,
+                                 first_chunk=first_chunk, strict=True)
+
+        for _ in range(self.options['repeat']):
+            for name in ('dashboard', *TABS):
+                call(reader, name)
+            call(reader, 'get_calls', query='?limit=50')
+            call(reader, 'get_call_dates')
+            call(reader, 'get_call_events')
+            call(reader, 'get_tracking')
+            call(reader, 'get_schedule')
+            call(reader, 'get_schedule_range', query=f'?from={today:%Y-%m}&to={today + timedelta(days=62):%Y-%m}')
+            call(reader, 'get_note')
+            call(reader, 'get_settings')
+            call(reader, 'get_notifications')
+            call(reader, 'notifications_stream', first_chunk=True)
+            call(reader, 'help_index')
+            call(reader, 'help_search', query='?' + urlencode({'q': 'тариф'}))
+
+            call(writer, 'admin_panel')
+            call(writer, 'admin_call_stats')
+            call(writer, 'export_data', query='?' + urlencode({'kind': 'calls', 'format': 'csv', 'user': operator.username}))
+            call(writer, 'admin_help_topics')
+
+            call_id = call(writer, 'add_call', 'POST', data={
+                'comment': 'Бенчмарк', 'phone': '+79990000000', 'call_type': 'Недозвон'
+            })['id']
+            call(writer, 'update_call_time', 'POST', data={'id': call_id})
+            call(writer, 'update_call_time_batch', 'POST', data={'ids[]': [call_id]})
+            call(writer, 'adjust_call_time', 'POST', data={'id': call_id, 'next_attempt': f'{later:%Y-%m-%dT%H:%M}'})
+            call(writer, 'postpone_call', 'POST', data={'id': call_id})
+            call(writer, 'update_call_comment', 'POST', data={'id': call_id, 'comment': 'Бенчмарк, правка'})
+            call(writer, 'update_call_phone', 'POST', data={'id': call_id, 'phone': '89990000001'})
+            call(writer, 'complete_call', 'POST', data={'id': call_id})
+            call_id = call(writer, 'add_call', 'POST', data={
+                'comment': 'Бенчмарк', 'phone': '+79990000000', 'call_type': 'Недозвон'
+            })['id']
+            call(writer, 'delete_calls', 'POST', data={'ids[]': [call_id]})
+
+            tracking_id = call(writer, 'add_tracking', 'POST', data={
+                'claim': 'Б-1', 'phone': '+79990000002', 'crm': '1',
+                'connection_datetime': f'{later:%Y-%m-%dT%H:%M}',
+            })['tracking_id']
+            call(writer, 'delete_tracking', 'POST', data={'ids[]': [tracking_id]})
+            call(writer, 'import_calls_file', 'POST', files={'file': ('calls.csv', IMPORT_CSV.encode())})
+            call(writer, 'clear_all_records', 'POST')
+
+            task_id = call(writer, 'add_task', 'POST', data={'date': f'{today:%Y-%m-%d}', 'task': 'Бенчмарк'})['id']
+            call(writer, 'toggle_task', 'POST', data={'id': task_id})
+            call(writer, 'delete_task', 'POST', data={'id': task_id})
+            call(writer, 'save_note', 'POST', data={'content': f'Бенчмарк {uuid.uuid4().hex}'})
+            call(writer, 'save_settings', 'POST', data={'schedule_type': '5/2', 'volume': '50'})
+            call(writer, 'reset_settings', 'POST')
+
+            user_id = call(writer, 'admin_add_user', 'POST', data={
+                'username': f'{self.options["prefix"]}_tmp_{uuid.uuid4().hex[:8]}',
+                'password': self.options['password'],
+            })['user_id']
+            call(writer, 'admin_delete_user', 'POST', data={'user_id': user_id})
+
+            # Темы и вкладки справочника в ответе без id – находим их по названию
+            title = f'[{self.options["prefix"]}] bench {uuid.uuid4().hex[:8]}'
+            call(writer, 'admin_add_topic', 'POST', data={'title': title})
+            topic_id = HelpTopic.objects.filter(title=title).values_list('id', flat=True).get()
+            call(writer, 'admin_edit_topic', 'POST', data={'id': topic_id, 'title': title, 'order': '2000'})
+            call(writer, 'admin_add_tab', 'POST', data={'topic_id': topic_id, 'title': title, 'content': 'Бенчмарк'})
+            tab_id = HelpTab.objects.filter(topic_id=topic_id).values_list('id', flat=True).get()
+            call(writer, 'admin_edit_tab', 'POST', data={'id': tab_id, 'content': 'Бенчмарк, правка'})
+            call(writer, 'admin_delete_tab', 'POST', data={'id': tab_id})
+            call(writer, 'admin_delete_topic', 'POST', data={'id': topic_id})
+        reader.close()
+        writer.close()
+
+    # ---------- смешанная нагрузка ----------
+
+    def mix(self, stats, operators):
+        deadline = time.monotonic() + self.options['seconds']
+        threads = [
+            threading.Thread(target=self.operator, args=(stats, n, user, deadline))
+            for n, user in enumerate(operators)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def operator(self, stats, n, user, deadline):
+        rng = random.Random(self.options['seed'] * 100003 + n)
+        interval = self.options['interval']
+        session = self.login(user)
+        etags = {}
+        call_ids = []
+
+        def get(name, query=''):
+            # Браузер повторяет запрос с If-None-Match и получает 304
+            headers = {'If-None-Match': etags[name]} if name in etags else None
+            return stats.request(session, name, 'GET', reverse(name) + query, headers=headers, etags=etags)
+
+        def post(name, data):
+            return stats.request(session, name, 'POST', reverse(name), data)
+
+        try:
+            # Операторы начинают вразнобой, как в жизни
+            time.sleep(interval * n / self.options['operators'])
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                get('get_notifications')
+                calls = get('get_calls', '?limit=50')
+                if calls:
+                    call_ids = [row['id'] for row in calls['calls']]
+                get('get_tracking')
+
+                if rng.random() < TAB_SWITCH_SHARE:
+                    tab = rng.choice(list(TABS))
+                    get(tab)
+                    get(*TABS[tab])
+                if rng.random() < ADD_CALL_SHARE:
+                    post('add_call', {
+                        'comment': 'Нагрузка', 'phone': f'+7999{rng.randrange(10 ** 7):07d}',
+                        'call_type': 'Недозвон',
+                    })
+                if call_ids and rng.random() < NO_ANSWER_SHARE:
+                    post('update_call_time', {'id': rng.choice(call_ids)})
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            session.close()
+
+    # ---------- отчёт ----------
+
+    def report(self, result):
+        for phase, title in (('sweep', 'Обход всех URL'), ('mix', 'Смешанная нагрузка')):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{title:<24} {"запр":>6} {"p50 мс":>8} {"p95 мс":>8} {"p99 мс":>8} {"SQL":>6} {"ошиб":>5}'
+            ))
+            for name, row in sorted(result[phase].items()):
+                queries = '-' if row['queries'] is None else f'{row["queries"]:.1f}'
+                self.stdout.write(
+                    f'{name:<24} {row["count"]:>6} {row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} '
+                    f'{row["p99_ms"]:>8.1f} {queries:>6} {row["errors"]:>5}'
+                )
+        self.stdout.write(
+            f'Смешанная нагрузка: {result["requests"]} запросов, {result["throughput"]:.1f} запр/с, '
+            f'ошибок {result["errors"]}'
+        )
+
+    def compare(self, baseline, result, threshold):
+        """Регрессии: рост задержки или запросов к БД, падение пропускной способности."""
+        changed = [name for name, value in result['options'].items() if baseline['options'].get(name) != value]
+        if changed:
+            self.stderr.write(self.style.WARNING(
+                f'Параметры отличаются от базовой линии ({", ".join(changed)}): сравнение может быть неточным'
+            ))
+        regressions = []
+        for phase in ('sweep', 'mix'):
+            for name, row in sorted(result[phase].items()):
+                base = baseline[phase].get(name)
+                if base is None:
+                    self.stdout.write(f'{phase} {name}: нет в базовой линии')
+                    continue
+                metric = REGRESSION_METRIC[phase]
+                if row[metric] > base[metric] * (1 + threshold) and row[metric] - base[metric] > MIN_REGRESSION_MS:
+                    regressions.append(
+                        f'{phase} {name}: {metric[:3]} {base[metric]:.1f} → {row[metric]:.1f} мс'
+                    )
+                # Запросы к БД при обходе почти не зависят от случая; лишний запрос
+                # на каждый вызов (N+1) поднимает среднее на единицу
+                if phase == 'sweep' and None not in (row['queries'], base['queries']) \
+                        and row['queries'] > base['queries'] + 0.5:
+                    regressions.append(f'{name}: запросов к БД {base["queries"]:.1f} → {row["queries"]:.1f}')
+        if result['throughput'] < baseline['throughput'] * (1 - threshold):
+            regressions.append(
+                f'пропускная способность {baseline["throughput"]:.1f} → {result["throughput"]:.1f} запр/с'
+            )
+        if regressions:
+            raise CommandError('Регрессии относительно базовой линии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий относительно базовой линии нет'))
+
+
+# Имена URL, которые вызывает обход (для проверки покрытия core/urls.py)
+SWEEP_NAMES = (
+    'dashboard', *TABS, 'get_calls', 'get_call_dates', 'get_call_events', 'add_call', 'update_call_time',
+    'update_call_time_batch', 'adjust_call_time', 'delete_calls', 'clear_all_records', 'postpone_call',
+    'complete_call', 'update_call_comment', 'update_call_phone', 'import_calls_file', 'get_tracking',
+    'add_tracking', 'delete_tracking', 'get_schedule', 'get_schedule_range', 'add_task', 'toggle_task',
+    'delete_task', 'get_note', 'save_note', 'get_settings', 'save_settings', 'reset_settings',
+    'get_notifications', 'notifications_stream', 'admin_panel', 'admin_add_user', 'admin_delete_user',
+    'export_data', 'admin_call_stats', 'help_index', 'help_search', 'admin_help_topics', 'admin_add_topic',
+    'admin_edit_topic', 'admin_delete_topic', 'admin_add_tab', 'admin_edit_tab', 'admin_delete_tab',
+)
+
+
+class Stats:
+    """Задержки, запросы к БД и ошибки по эндпоинтам; общий для потоков."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def request(self, session, name, method, path, data=None, files=None, first_chunk=False,
+                headers=None, etags=None, strict=False):
+        """
+        Выполняет запрос и записывает замер; возвращает разобранный
+        JSON-ответ или None. strict – ошибка HTTP прерывает бенчмарк.
+        """
+        started = time.monotonic()
+        status, body, etag, queries = session.request(method, path, data, files, headers, first_chunk)
+        elapsed = time.monotonic() - started
+        with self.lock:
+            row = self.endpoints.setdefault(name, {'latencies': [], 'queries': [], 'errors': 0})
+            row['latencies'].append(elapsed)
+            if queries is not None:
+                row['queries'].append(queries)
+            if status >= 400:
+                row['errors'] += 1
+        if etags is not None and etag:
+            etags[name] = etag
+        if strict and status >= 400:
+            raise CommandError(f'{method} {path}: HTTP {status} {body[:200].decode(errors="replace")}')
+        if status == 200 and body[:1] == b'{':
+            return json.loads(body)
+        return None
+
+    def count(self):
+        return sum(len(row['latencies']) for row in self.endpoints.values())
+
+    def errors(self):
+        return sum(row['errors'] for row in self.endpoints.values())
+
+    def result(self):
+        endpoints = {}
+        for name, row in self.endpoints.items():
+            latencies = row['latencies']
+            endpoints[name] = {
+                'count': len(latencies),
+                'errors': row['errors'],
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                'queries': round(sum(row['queries']) / len(row['queries']), 2) if row['queries'] else None,
+            }
+        return endpoints
+
+
+class ClientTransport:
+    """Тестовый клиент Django: приложение в процессе, с подсчётом запросов к БД."""
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST=HOST)
+
+    def login(self, user, password):
+        self.client.force_login(user)
+
+    def request(self, method, path, data, files, headers, first_chunk):
+        data = dict(data or {})
+        for field, (filename, content) in (files or {}).items():
+            data[field] = SimpleUploadedFile(filename, content)
+        extra = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in (headers or {}).items()}
+        contexts = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for context in contexts:
+            context.__enter__()
+        try:
+            if method == 'GET':
+                response = self.client.get(path, **extra)
+            else:
+                response = self.client.post(path, data, **extra)
+            if response.streaming:
+                # Поток уведомлений бесконечен: достаточно первой части
+                chunks = iter(response.streaming_content)
+                body = next(chunks, b'') if first_chunk else b''.join(chunks)
+                response.close()
+            else:
+                body = response.content
+        finally:
+            for context in contexts:
+                context.__exit__(None, None, None)
+        return response.status_code, body, response.get('ETag'), sum(len(context) for context in contexts)
+
+    def close(self):
+        # Каждый поток оператора открывает свои подключения к БД
+        for connection in connections.all(initialized_only=True):
+            connection.close()
+
+
+class ServerTransport:
+    """HTTP-запросы к запущенному серверу; число запросов к БД неизвестно."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def login(self, user, password):
+        path = reverse('login')
+        self.request('GET', path, None, None, None, False)
+        status, _, _, _ = self.request('POST', path, {
+            'username': user.username, 'password': password, 'csrfmiddlewaretoken': self.csrf_token(),
+        }, None, None, False)
+        if not any(cookie.name == settings.SESSION_COOKIE_NAME for cookie in self.cookies):
+            raise CommandError(f'Не удалось войти как {user.username} (HTTP {status}): проверьте --password')
+
+    def request(self, method, path, data, files, headers, first_chunk):
+        headers = dict(headers or {})
+        body = None
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.csrf_token()
+            headers['Referer'] = self.base_url + path
+            if files:
+                body, headers['Content-Type'] = multipart(data or {}, files)
+            else:
+                body = urlencode(data or {}, doseq=True).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            response = self.opener.open(request)
+        except HTTPError as e:
+            # 304 и ошибки urllib тоже выдаёт исключением
+            with e:
+                return e.code, e.read(), e.headers.get('ETag'), None
+        with response:
+            content = response.readline() if first_chunk else response.read()
+            return response.status, content, response.headers.get('ETag'), None
+
+    def close(self):
+        pass
+
+
+def multipart(data, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in data.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
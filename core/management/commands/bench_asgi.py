@@ -0,0 +1,218 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+
+from core.benchutils import HOST, allow_bench_host, percentile
+
+# Опрос, который делает вкладка оператора
+POLL_PATHS = ['/api/notifications/', '/api/calls/?limit=50', '/api/tracking/', '/api/note/']
+STREAM_PATH = '/api/notifications/stream/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: одинаковое число операторов опрашивает сервер под WSGI '
+        '(пул из --threads потоков, как у gunicorn gthread) и под ASGI. Приложение '
+        'вызывается в процессе, без сети; каждый режим – в отдельном процессе. '
+        'Операторы load_op* создаются при необходимости; данные для них готовит '
+        'manage.py seed_load. Запускайте на тестовой БД (DB_NAME в .env).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=200, help='Операторов, опрашивающих сервер')
+        parser.add_argument('--streams', type=int, default=0,
+                            help='Сколько операторов дополнительно держат поток уведомлений')
+        parser.add_argument('--interval', type=float, default=2.0, help='Период опроса одного оператора, секунды')
+        parser.add_argument('--seconds', type=float, default=10, help='Длительность прогона')
+        parser.add_argument('--threads', type=int, default=8, help='Рабочих потоков WSGI')
+        parser.add_argument('--prefix', default='load_op', help='Префикс логинов операторов')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], help='Один режим в текущем процессе')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self.run_mode(options)
+            return
+        # Режимы различаются набором представлений (ASYNC_VIEWS), поэтому –
+        # отдельные процессы
+        for mode in ('wsgi', 'asgi'):
+            env = dict(os.environ, ASYNC_VIEWS='true' if mode == 'asgi' else 'false')
+            # Под WSGI поток по умолчанию выключен; здесь он нужен для сравнения
+            env['NOTIFICATION_STREAM_ENABLED'] = 'true'
+            # Потоки уведомлений должны закончиться вместе с прогоном
+            env['NOTIFICATION_STREAM_TIMEOUT'] = str(int(options['seconds']))
+            args = [sys.executable, sys.argv[0], 'bench_asgi', '--mode', mode]
+            for name in ('operators', 'streams', 'interval', 'seconds', 'threads', 'prefix'):
+                args += [f'--{name}', str(options[name])]
+            subprocess.run(args, env=env, check=True)
+
+    def sessions(self, prefix, count):
+        """
+        Сессии операторов; созданные для прогона сессии и операторов
+        запоминает в self.session_keys и self.created_users.
+        """
+        cookies = []
+        for n in range(count):
+            user, created = User.objects.get_or_create(username=f'{prefix}{n}')
+            if created:
+                user.set_unusable_password()
+                user.save()
+                self.created_users.append(user.pk)
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+            self.session_keys.append(session.session_key)
+            cookies.append(f'{settings.SESSION_COOKIE_NAME}={session.session_key}')
+        return cookies
+
+    def run_mode(self, options):
+        self.session_keys = []
+        self.created_users = []
+        try:
+            cookies = self.sessions(options['prefix'], options['operators'] + options['streams'])
+            if options['mode'] == 'wsgi':
+                client = WsgiClient(options['threads'])
+            else:
+                client = AsgiClient()
+            with allow_bench_host():
+                result = asyncio.run(self.load(client, cookies, options))
+        finally:
+            # Повторные прогоны не должны копить сессии и операторов в БД
+            Session.objects.filter(session_key__in=self.session_keys).delete()
+            User.objects.filter(pk__in=self.created_users).delete()
+        self.report(options, result)
+
+    async def load(self, client, cookies, options):
+        deadline = time.monotonic() + options['seconds']
+        result = {'latencies': [], 'errors': 0}
+
+        async def operator(n, cookie):
+            # Операторы начинают вразнобой, как в жизни
+            await asyncio.sleep(options['interval'] * n / options['operators'])
+            i = n
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                status = await client.get(POLL_PATHS[i % len(POLL_PATHS)], cookie)
+                i += 1
+                result['latencies'].append(time.monotonic() - started)
+                if status not in (200, 304):
+                    result['errors'] += 1
+                await asyncio.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+
+        tasks = [operator(n, cookie) for n, cookie in enumerate(cookies[:options['operators']])]
+        tasks += [client.get(STREAM_PATH, cookie) for cookie in cookies[options['operators']:]]
+        await asyncio.gather(*tasks)
+        client.close()
+        return result
+
+    def report(self, options, result):
+        latencies = result['latencies']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{options["mode"].upper()}: операторов {options["operators"]}, '
+            f'потоков уведомлений {options["streams"]}'
+            + (f', рабочих потоков {options["threads"]}' if options['mode'] == 'wsgi' else '')
+        ))
+        self.stdout.write(
+            f'  {len(latencies) / options["seconds"]:7.1f} запр/с, '
+            f'p50 {percentile(latencies, 0.5) * 1000:7.1f} мс, '
+            f'p99 {percentile(latencies, 0.99) * 1000:7.1f} мс, '
+            f'ошибок {result["errors"]}'
+        )
+
+
+class WsgiClient:
+    """Запросы к WSGI-приложению через пул потоков фиксированного размера."""
+
+    def __init__(self, threads):
+        from django.core.handlers.wsgi import WSGIHandler
+        self.app = WSGIHandler()
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def request(self, path, cookie):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'HTTP_HOST': HOST,
+            'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+        }
+        status = []
+        body = self.app(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return status[0]
+
+    async def get(self, path, cookie):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self.request, path, cookie)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class AsgiClient:
+    """Запросы к ASGI-приложению в цикле событий текущего процесса."""
+
+    def __init__(self):
+        from django.core.handlers.asgi import ASGIHandler
+        self.app = ASGIHandler()
+
+    async def get(self, path, cookie):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+            'server': (HOST, 80),
+            'client': ('127.0.0.1', 0),
+        }
+        status = []
+        body_read = False
+        finished = asyncio.Event()
+
+        async def receive():
+            # Тело запроса пустое; дальше – ждём, пока ответ не закончится
+            nonlocal body_read
+            if not body_read:
+                body_read = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        await self.app(scope, receive, send)
+        return status[0]
+
+    def close(self):
+        pass
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchutils import percentile
+from core.db import sqlite_pragma_statements
+
+# Таймаут модуля sqlite3 по умолчанию – так Django подключается без настроек
+DEFAULT_TIMEOUT = 5.0
+
+SCHEMA = '''
+CREATE TABLE calls (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    comment TEXT NOT NULL,
+    next_attempt TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX calls_user_next ON calls (user_id, next_attempt, id);
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite без настроек и с профилем production (WAL и PRAGMA из '
+        'SQLITE_PRODUCTION_PRAGMAS) под одновременным чтением и записью. '
+        'Работает на временном файле и не трогает рабочую БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=16, help='Потоков, опрашивающих список звонков')
+        parser.add_argument('--writers', type=int, default=4, help='Потоков, меняющих звонки')
+        parser.add_argument('--seconds', type=float, default=5, help='Длительность каждого прогона')
+        parser.add_argument('--rows', type=int, default=50000, help='Звонков в таблице')
+        parser.add_argument('--users', type=int, default=100, help='Операторов')
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('по умолчанию', []),
+            ('production', sqlite_pragma_statements(settings.SQLITE_PRODUCTION_PRAGMAS)),
+        ]
+        for name, statements in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self.seed(path, options['rows'], options['users'])
+                result = self.run(path, statements, options)
+            self.report(name, result, options['seconds'])
+
+    def seed(self, path, rows, users):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO calls (user_id, comment, next_attempt, updated_at) VALUES (?, ?, ?, ?)',
+            ((i % users, f'Звонок {i}', f'2026-01-01 {i % 24:02d}:{i % 60:02d}', '2026-01-01') for i in range(rows))
+        )
+        conn.commit()
+        conn.close()
+
+    def connect(self, path, statements):
+        conn = sqlite3.connect(path, timeout=DEFAULT_TIMEOUT, isolation_level=None, check_same_thread=False)
+        for statement in statements:
+            conn.execute(statement)
+        return conn
+
+    def run(self, path, statements, options):
+        users = options['users']
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        result = {'read': [], 'write': [], 'errors': 0}
+
+        def worker(kind, seed):
+            conn = self.connect(path, statements)
+            latencies, errors, i = [], 0, seed
+            while time.monotonic() < deadline:
+                i += 1
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        # Как get_calls: страница звонков оператора
+                        conn.execute(
+                            'SELECT id, comment, next_attempt FROM calls WHERE user_id = ? '
+                            'ORDER BY next_attempt, id LIMIT 200', (i % users,)
+                        ).fetchall()
+                    else:
+                        # Как отметка «недозвон»: короткая транзакция записи
+                        conn.execute('BEGIN IMMEDIATE')
+                        conn.execute(
+                            'UPDATE calls SET next_attempt = ?, updated_at = ? WHERE id = ?',
+                            ('2026-01-02 10:00', '2026-01-02', i * 7919 % options['rows'] + 1)
+                        )
+                        conn.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    continue
+                latencies.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                result[kind].extend(latencies)
+                result['errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=('read', n)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', n)) for n in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, seconds):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Профиль: {name}'))
+        for kind, label in (('read', 'Чтение'), ('write', 'Запись')):
+            latencies = result[kind]
+            self.stdout.write(
+                f'  {label}: {len(latencies) / seconds:8.0f} оп/с, '
+                f'p50 {percentile(latencies, 0.5) * 1000:6.2f} мс, '
+                f'p99 {percentile(latencies, 0.99) * 1000:7.2f} мс'
+            )
+        self.stdout.write(f'  Ошибок «database is locked»: {result["errors"]}')
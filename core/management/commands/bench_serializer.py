@@ -0,0 +1,76 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.utils import BatchSerializer, calc_notification_status, calc_time_until, ceil_to_minute
+
+
+def serialize_call_per_row(row):
+    """Прежняя построчная сериализация звонка – для сравнения."""
+    rounded_next = ceil_to_minute(row['next_attempt'])
+    first_local = timezone.localtime(row['first_attempt'])
+    next_local = timezone.localtime(rounded_next)
+    return {
+        'id': row['id'],
+        'comment': row['comment'],
+        'phone': row['phone'],
+        'first_attempt': first_local.strftime('%Y-%m-%d %H:%M'),
+        'next_attempt': next_local.strftime('%Y-%m-%d %H:%M'),
+        'attempt_number': row['attempt_number'],
+        'time_until': calc_time_until(rounded_next),
+        'notification_status': calc_notification_status(rounded_next),
+        'call_type': row['call_type'],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стоимость сериализации списка звонков: построчно и пачкой (BatchSerializer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Сколько звонков в списке')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторить замер')
+        parser.add_argument(
+            '--spread', type=int, default=8 * 60,
+            help='На сколько минут вперёд разбросаны звонки (меньше – больше совпадений по минуте)'
+        )
+
+    def handle(self, *args, **options):
+        rows = self.make_rows(options['rows'], options['spread'])
+
+        per_row = self.measure(lambda: [serialize_call_per_row(row) for row in rows], options['repeat'])
+        batched = self.measure(lambda: BatchSerializer().calls(rows), options['repeat'])
+
+        count = len(rows)
+        self.stdout.write(f'Звонков: {count}, повторов: {options["repeat"]} (лучшее время)')
+        self.stdout.write(f'Построчно: {per_row * 1e6 / count:.2f} мкс на строку')
+        self.stdout.write(f'Пачкой:    {batched * 1e6 / count:.2f} мкс на строку')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: {per_row / batched:.1f}x'))
+
+    @staticmethod
+    def make_rows(count, spread):
+        now = timezone.now()
+        return [
+            {
+                'id': i,
+                'comment': f'Звонок {i}',
+                'phone': '89990000000',
+                'first_attempt': now - timedelta(seconds=random.randint(0, 3600)),
+                'next_attempt': now + timedelta(seconds=random.randint(-600, spread * 60)),
+                'attempt_number': random.randint(1, 5),
+                'call_type': 'Недозвон',
+            }
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import IMPORT_BATCH_SIZE, import_calls, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Импортирует звонки пользователя из CSV или XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Логин оператора, которому добавить звонки')
+        parser.add_argument('path', help='Путь к файлу .csv или .xlsx')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Сколько строк записывать одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["username"]} не найден')
+
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_calls(user, iter_rows(f, options['path']), options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f'Строка {error["row"]}: {error["error"]}')
+        if result.error_count > len(result.errors):
+            self.stderr.write(f'... и ещё {result.error_count - len(result.errors)} ошибок')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано звонков: {result.created}, строк с ошибками: {result.error_count}'
+        ))
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.callstats import rebuild
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Неверная дата {value}: нужен формат ГГГГ-ММ-ДД')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает дневные счётчики звонков за период с нуля по журналу '
+        'событий звонков: строки периода удаляются и собираются заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=parse_date, help='Первый день, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', type=parse_date, help='Последний день, ГГГГ-ММ-ДД')
+        parser.add_argument('--user', help='Логин оператора (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['user']:
+            users = User.objects.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'Пользователь {options["user"]} не найден')
+        written, skipped = rebuild(options['date_from'], options['date_to'], users)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Пропущено событий без типа звонка: {skipped}'))
+        self.stdout.write(self.style.SUCCESS(f'Записано строк статистики: {written}'))
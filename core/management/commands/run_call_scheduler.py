@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from core.scheduler import CallScheduler
+
+
+class Command(BaseCommand):
+    help = 'Запускает планировщик наступивших звонков (куча таймеров в памяти)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stop-after', type=float, default=None,
+            help='Остановиться через указанное число секунд (для отладки)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.CALL_SCHEDULER_ENABLED:
+            raise CommandError(
+                'Планировщик выключен: задайте CALL_SCHEDULER_ENABLED=true, '
+                'иначе веб-процессы не будут читать его события'
+            )
+        self.stdout.write(
+            f'Планировщик слушает {settings.CALL_SCHEDULER_HOST}:{settings.CALL_SCHEDULER_PORT}'
+        )
+        try:
+            CallScheduler().run(stop_after=options['stop_after'])
+        except KeyboardInterrupt:
+            self.stdout.write('Планировщик остановлен')
@@ -0,0 +1,181 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import helpsearch
+from core.helppage import bump_help_version
+from core.models import CallRecord, DailyTask, HelpTab, HelpTopic, Note, TrackingRecord, UserSettings
+
+BATCH_SIZE = 1000
+
+# Доли типов звонков в очереди оператора
+CALL_TYPE_WEIGHTS = {'Недозвон': 50, 'Перезвон': 30, 'Отслеживание': 12, 'Исчерпан': 8}
+
+WORDS = (
+    'клиент абонент заявка договор тариф подключение роутер оплата перезвонить '
+    'уточнить адрес мастер выезд интернет телевидение баланс скидка акция '
+    'номер паспорт документы консультация жалоба отказ перенос время'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт операторов с реалистичным объёмом данных для нагрузочных тестов: '
+        'звонки, заявки, задачи, заметки и справочник. Уже существующие операторы '
+        'с тем же префиксом пропускаются. Запускайте на тестовой БД (DB_NAME в .env).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=50, help='Сколько операторов создать')
+        parser.add_argument('--calls', type=int, default=300, help='Звонков в очереди оператора')
+        parser.add_argument('--tracking', type=int, default=40, help='Заявок у оператора')
+        parser.add_argument('--task-days', type=int, default=90, help='За сколько дней задачи (до и после сегодня)')
+        parser.add_argument('--tasks-per-day', type=int, default=3, help='Больше всего задач в день')
+        parser.add_argument('--note-size', type=int, default=4000, help='Примерный размер заметки, символов')
+        parser.add_argument('--help-topics', type=int, default=15, help='Тем справочника (0 – не создавать)')
+        parser.add_argument('--help-tabs', type=int, default=6, help='Вкладок в теме справочника')
+        parser.add_argument('--prefix', default='load_op', help='Префикс логинов операторов')
+        parser.add_argument('--password', default='load', help='Пароль операторов (для входа на сервер)')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора: одинаковые данные при повторе')
+        parser.add_argument('--clear', action='store_true',
+                            help='Сначала удалить операторов с этим префиксом и их справочник')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            if options['clear']:
+                deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+                HelpTopic.objects.filter(title__startswith=f'[{prefix}]').delete()
+                self.stdout.write(f'Удалено объектов: {deleted}')
+
+            users = self.create_users(prefix, options['operators'], options['password'])
+            calls = self.create_calls(users, options['calls'])
+            tracking = self.create_tracking(users, options['tracking'])
+            tasks = self.create_tasks(users, options['task_days'], options['tasks_per_day'])
+            Note.objects.bulk_create(
+                [Note(user=user, content=self.text(options['note_size'])) for user in users],
+                batch_size=BATCH_SIZE
+            )
+            tabs = 0
+            if options['help_topics'] and not HelpTopic.objects.filter(title__startswith=f'[{prefix}]').exists():
+                tabs = self.create_help(prefix, options['help_topics'], options['help_tabs'])
+
+        if tabs:
+            # bulk_create обходит сигналы: индекс и страница справочника – вручную
+            helpsearch.rebuild_index()
+            bump_help_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Операторов: {len(users)}, звонков: {calls}, заявок: {tracking}, '
+            f'задач: {tasks}, вкладок справочника: {tabs}'
+        ))
+
+    def text(self, length):
+        words = []
+        size = 0
+        while size < length:
+            word = self.rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return ' '.join(words)
+
+    def phone(self):
+        return f'+7999{self.rng.randrange(10 ** 7):07d}'
+
+    def create_users(self, prefix, count, password):
+        existing = set(User.objects.filter(username__startswith=prefix).values_list('username', flat=True))
+        password_hash = make_password(password)
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{n}', password=password_hash)
+            for n in range(count) if f'{prefix}{n}' not in existing
+        ], batch_size=BATCH_SIZE)
+        # Настройки создаёт сигнал post_save, а bulk_create его не вызывает
+        UserSettings.objects.bulk_create([UserSettings(user=user) for user in users], batch_size=BATCH_SIZE)
+        return users
+
+    def create_calls(self, users, per_user):
+        types = list(CALL_TYPE_WEIGHTS)
+        weights = list(CALL_TYPE_WEIGHTS.values())
+        calls = []
+        for user in users:
+            for _ in range(per_user):
+                share = self.rng.random()
+                if share < 0.2:
+                    # просроченные
+                    next_attempt = self.now - timedelta(minutes=self.rng.randrange(1, 2 * 24 * 60))
+                elif share < 0.5:
+                    # на сегодня
+                    next_attempt = self.now + timedelta(minutes=self.rng.randrange(1, 10 * 60))
+                else:
+                    next_attempt = self.now + timedelta(minutes=self.rng.randrange(10 * 60, 7 * 24 * 60))
+                next_attempt = next_attempt.replace(second=0, microsecond=0)
+                call_type = self.rng.choices(types, weights)[0]
+                attempt_number = 1 if call_type == 'Отслеживание' else self.rng.randint(1, 6)
+                calls.append(CallRecord(
+                    user=user,
+                    comment=self.text(40),
+                    phone=self.phone(),
+                    first_attempt=next_attempt - timedelta(hours=self.rng.randint(1, 72)),
+                    next_attempt=next_attempt,
+                    attempt_number=attempt_number,
+                    call_type=call_type,
+                    notified_at=self.now if share < 0.15 else None,
+                ))
+        self.created_calls = CallRecord.objects.bulk_create(calls, batch_size=BATCH_SIZE)
+        return len(calls)
+
+    def create_tracking(self, users, per_user):
+        # Заявки в работе связаны со звонками «Отслеживание», остальные выполнены
+        tracked_calls = {}
+        for call in self.created_calls:
+            if call.call_type == 'Отслеживание':
+                tracked_calls.setdefault(call.user_id, []).append(call)
+        records = []
+        for user in users:
+            linked = tracked_calls.get(user.pk, [])[:per_user]
+            for n in range(per_user):
+                call = linked[n] if n < len(linked) else None
+                records.append(TrackingRecord(
+                    user=user,
+                    claim=f'З-{self.rng.randrange(10 ** 6):06d}',
+                    phone=call.phone if call else self.phone(),
+                    crm=str(self.rng.randrange(10 ** 8)),
+                    connection_datetime=self.now - timedelta(hours=self.rng.randint(1, 24 * 30)),
+                    call_record=call,
+                    status='Активна' if call else 'Выполнена',
+                    completed=call is None,
+                ))
+        TrackingRecord.objects.bulk_create(records, batch_size=BATCH_SIZE)
+        return len(records)
+
+    def create_tasks(self, users, days, per_day):
+        today = timezone.localdate(self.now)
+        tasks = []
+        for user in users:
+            for offset in range(-days, days + 1):
+                day = today + timedelta(days=offset)
+                for _ in range(self.rng.randint(0, per_day)):
+                    tasks.append(DailyTask(user=user, date=day, task=self.text(30), completed=offset < 0))
+        DailyTask.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        return len(tasks)
+
+    def create_help(self, prefix, topics, tabs_per_topic):
+        created = HelpTopic.objects.bulk_create([
+            HelpTopic(title=f'[{prefix}] Тема {n + 1}: {self.text(20)}', order=1000 + n)
+            for n in range(topics)
+        ])
+        tabs = [
+            HelpTab(topic=topic, title=f'Вкладка {n + 1}: {self.text(15)}', content=self.text(3000), order=n)
+            for topic in created
+            for n in range(tabs_per_topic)
+        ]
+        HelpTab.objects.bulk_create(tabs, batch_size=BATCH_SIZE)
+        return len(tabs)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_trackingrecord_completed_trackingrecord_phone_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='callrecord',
+            index=models.Index(fields=['user', 'notified_at', 'next_attempt'], name='call_due_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:12
+
+import json
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def normalize_intervals(apps, schema_editor):
+    """Приводит сохранённые интервалы к проверенному JSON."""
+    from core.retry import load_intervals
+
+    UserSettings = apps.get_model('core', 'UserSettings')
+    for settings in UserSettings.objects.only('id', 'intervals'):
+        normalized = json.dumps(load_intervals(settings.intervals), ensure_ascii=False)
+        if normalized != settings.intervals:
+            UserSettings.objects.filter(id=settings.id).update(intervals=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersettings',
+            name='retry_backoff_cap',
+            field=models.PositiveIntegerField(default=1440, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10080)], verbose_name='Предел удвоения интервала, минуты'),
+        ),
+        migrations.AddField(
+            model_name='usersettings',
+            name='retry_tail',
+            field=models.CharField(choices=[('repeat', 'Повторять последний интервал'), ('backoff', 'Удваивать интервал до предела'), ('give_up', 'Прекратить попытки')], default='repeat', max_length=20, verbose_name='После последнего интервала'),
+        ),
+        migrations.AlterField(
+            model_name='callrecord',
+            name='call_type',
+            field=models.CharField(choices=[('Недозвон', 'Недозвон'), ('Перезвон', 'Перезвон'), ('Отслеживание', 'Отслеживание'), ('Исчерпан', 'Попытки исчерпаны')], default='Недозвон', max_length=20),
+        ),
+        migrations.RunPython(normalize_intervals, migrations.RunPython.noop),
+    ]
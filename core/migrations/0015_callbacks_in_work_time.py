@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_retry_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersettings',
+            name='callbacks_in_work_time',
+            field=models.BooleanField(default=False, verbose_name='Переносить перезвоны на рабочее время'),
+        ),
+    ]
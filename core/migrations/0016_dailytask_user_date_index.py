@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_callbacks_in_work_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailytask',
+            index=models.Index(fields=['user', 'date'], name='task_user_date_idx'),
+        ),
+    ]
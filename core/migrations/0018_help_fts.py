@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_help_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS core_help_fts USING fts5("
+        "topic_title, title, content, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        'INSERT INTO core_help_fts (rowid, topic_title, title, content) '
+        'SELECT t.id, p.title, t.title, t.content '
+        'FROM core_helptab t JOIN core_helptopic p ON p.id = t.topic_id'
+    )
+
+
+def drop_help_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS core_help_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_note_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_help_fts, drop_help_fts),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0018_help_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('call_type', models.CharField(choices=[('Недозвон', 'Недозвон'), ('Перезвон', 'Перезвон'), ('Отслеживание', 'Отслеживание'), ('Исчерпан', 'Попытки исчерпаны')], max_length=20)),
+                ('added', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('success_attempts', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='call_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='call_stat_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='callstat',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'call_type'), name='call_stat_unique'),
+        ),
+    ]
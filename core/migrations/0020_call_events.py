@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0019_call_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.BigIntegerField()),
+                ('code', models.PositiveSmallIntegerField(choices=[(1, 'Добавлен'), (2, 'Недозвон'), (3, 'Попытки исчерпаны'), (4, 'Отложен'), (5, 'Время изменено'), (6, 'Выполнен'), (7, 'Удалён')])),
+                ('attempt', models.PositiveSmallIntegerField(default=0)),
+                ('at', models.BigIntegerField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='call_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['call_id', 'at'], name='call_event_call_idx'), models.Index(fields=['user', 'at'], name='call_event_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+# Как CallEvent.CALL_TYPE_CODES на момент миграции
+CALL_TYPE_CODES = {'Недозвон': 1, 'Перезвон': 2, 'Отслеживание': 3, 'Исчерпан': 4}
+NO_ANSWER, EXHAUSTED = 2, 3
+
+
+def fill_call_types(apps, schema_editor):
+    """
+    Тип звонка для уже записанных событий: после недозвона – Перезвон, после
+    исчерпания попыток – Исчерпан, остальным – текущий тип звонка, если он
+    ещё есть. События удалённых звонков остаются с неизвестным типом (0).
+    """
+    CallEvent = apps.get_model('core', 'CallEvent')
+    CallRecord = apps.get_model('core', 'CallRecord')
+    CallEvent.objects.filter(code=NO_ANSWER).update(call_type=CALL_TYPE_CODES['Перезвон'])
+    CallEvent.objects.filter(code=EXHAUSTED).update(call_type=CALL_TYPE_CODES['Исчерпан'])
+    for call_type, code in CALL_TYPE_CODES.items():
+        CallEvent.objects.filter(
+            call_type=0, call_id__in=CallRecord.objects.filter(call_type=call_type).values('id')
+        ).update(call_type=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_help_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callevent',
+            name='call_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, '—'), (1, 'Недозвон'), (2, 'Перезвон'), (3, 'Отслеживание'), (4, 'Попытки исчерпаны')], default=0),
+        ),
+        migrations.RunPython(fill_call_types, migrations.RunPython.noop),
+    ]
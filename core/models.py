@@ -1,8 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
 
+from .retry import (
+    DEFAULT_BACKOFF_CAP, DEFAULT_INTERVALS, MAX_INTERVAL, MIN_INTERVAL, TAIL_CHOICES, TAIL_REPEAT,
+    load_intervals, validate_intervals,
+)
+from . import helpsearch
+from .helppage import bump_help_version
+from .settings_cache import invalidate_user_settings
+
 class UserSettings(models.Model):
     SCHEDULE_CHOICES = [
         ('5/2', 'Офисный 5/2'),
@@ -12,48 +21,73 @@ class UserSettings(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='settings')
     schedule_type = models.CharField(max_length=20, choices=SCHEDULE_CHOICES, default='5/2')
     first_work_date = models.DateField(null=True, blank=True, verbose_name='Первый рабочий день')
-    intervals = models.TextField(default=json.dumps({1: 20, 2: 30, 3: 60, 4: 120, 5: 240}))
+    intervals = models.TextField(default=json.dumps(DEFAULT_INTERVALS))
     sound_enabled = models.BooleanField(default=True)
     volume = models.PositiveSmallIntegerField(default=100, validators=[MinValueValidator(0), MaxValueValidator(100)])
     dark_theme = models.BooleanField(default=False, verbose_name='Тёмная тема')
     column_widths = models.TextField(default='{}', blank=True)
 
+    retry_tail = models.CharField(
+        max_length=20, choices=TAIL_CHOICES, default=TAIL_REPEAT,
+        verbose_name='После последнего интервала'
+    )
+    retry_backoff_cap = models.PositiveIntegerField(
+        default=DEFAULT_BACKOFF_CAP,
+        validators=[MinValueValidator(MIN_INTERVAL), MaxValueValidator(MAX_INTERVAL)],
+        verbose_name='Предел удвоения интервала, минуты'
+    )
+    callbacks_in_work_time = models.BooleanField(
+        default=False, verbose_name='Переносить перезвоны на рабочее время'
+    )
+
     def get_intervals_dict(self):
-        if not self.intervals:
-            return {1: 20, 2: 30, 3: 60, 4: 120, 5: 240}
-        raw = self.intervals.strip()
+        return load_intervals(self.intervals)
+
+    def clean(self):
         try:
-            str_dict = json.loads(raw)
-            return {int(k): v for k, v in str_dict.items()}
-        except (json.JSONDecodeError, ValueError, TypeError):
-            try:
-                fixed = raw.replace("'", '"')
-                str_dict = json.loads(fixed)
-                return {int(k): v for k, v in str_dict.items()}
-            except:
-                return {1: 20, 2: 30, 3: 60, 4: 120, 5: 240}
+            validate_intervals(self.intervals)
+        except ValidationError as e:
+            raise ValidationError({'intervals': e.messages})
 
     def save(self, *args, **kwargs):
-        if isinstance(self.intervals, dict):
-            self.intervals = json.dumps(self.intervals, ensure_ascii=False)
-        elif isinstance(self.intervals, str):
-            try:
-                json.loads(self.intervals)
-            except:
-                try:
-                    fixed = self.intervals.replace("'", '"')
-                    json.loads(fixed)
-                    self.intervals = fixed
-                except:
-                    self.intervals = json.dumps({1: 20, 2: 30, 3: 60, 4: 120, 5: 240})
+        # Интервалы проверяются здесь, один раз; при чтении они уже корректны
+        self.intervals = json.dumps(validate_intervals(self.intervals), ensure_ascii=False)
+        if self.retry_tail not in dict(TAIL_CHOICES):
+            raise ValidationError(f'Неизвестное поведение после последнего интервала: {self.retry_tail}')
+        if not MIN_INTERVAL <= self.retry_backoff_cap <= MAX_INTERVAL:
+            raise ValidationError(f'Предел удвоения должен быть от {MIN_INTERVAL} до {MAX_INTERVAL} минут')
         super().save(*args, **kwargs)
 
 
+class DataVersion(models.Model):
+    """
+    Счётчик версии данных пользователя. Увеличивается при каждом изменении
+    его звонков, заявок, задач, заметки или настроек; по нему читающие
+    эндпоинты строят ETag и отвечают 304, не трогая таблицы записей.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, user):
+        return cls.objects.filter(user=user).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, user):
+        if cls.objects.filter(user=user).update(version=models.F('version') + 1):
+            return
+        # Первое изменение: строки ещё нет (или её только что создал соседний запрос)
+        _, created = cls.objects.get_or_create(user=user, defaults={'version': 1})
+        if not created:
+            cls.objects.filter(user=user).update(version=models.F('version') + 1)
+
+
 class CallRecord(models.Model):
     CALL_TYPES = [
         ('Недозвон', 'Недозвон'),
         ('Перезвон', 'Перезвон'),
         ('Отслеживание', 'Отслеживание'),
+        ('Исчерпан', 'Попытки исчерпаны'),
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='call_records')
     comment = models.CharField(max_length=255)
@@ -68,6 +102,32 @@ class CallRecord(models.Model):
 
     class Meta:
         ordering = ['next_attempt']
+        indexes = [
+            # Поиск просроченных неуведомлённых звонков пользователя
+            models.Index(fields=['user', 'notified_at', 'next_attempt'], name='call_due_idx'),
+            # Постраничная выдача списка звонков по ключу (next_attempt, id)
+            models.Index(fields=['user', 'next_attempt', 'id'], name='call_user_next_idx'),
+            # Дельта-синхронизация: изменённые после курсора
+            models.Index(fields=['user', 'updated_at'], name='call_user_updated_idx'),
+        ]
+
+
+class DueCallEvent(models.Model):
+    """
+    Событие «звонок наступил», которое публикует планировщик
+    (manage.py run_call_scheduler). Веб-процессы забирают отсюда
+    недоставленные события вместо сканирования очереди звонков.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='due_call_events')
+    call = models.ForeignKey(CallRecord, on_delete=models.CASCADE, related_name='due_events')
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'delivered_at'], name='due_event_pending_idx'),
+        ]
 
 
 class TrackingRecord(models.Model):
@@ -86,11 +146,111 @@ class TrackingRecord(models.Model):
     status = models.CharField(max_length=50, default='Активна', verbose_name='Статус')
     completed = models.BooleanField(default=False, verbose_name='Выполнена')  # новое поле
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='tracking_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.claim} - {self.phone}'
 
 
+class DeletedRecord(models.Model):
+    """
+    «Надгробие» удалённой записи: по нему клиент в режиме дельта-синхронизации
+    (?since=...) узнаёт, какие строки убрать из таблицы.
+    """
+    KIND_CHOICES = [
+        ('call', 'Звонок'),
+        ('tracking', 'Заявка'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deleted_records')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    record_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'kind', 'deleted_at'], name='deleted_record_sync_idx'),
+        ]
+
+
+class CallEvent(models.Model):
+    """
+    Журнал событий звонков – только добавление. Строка компактная: код
+    события и тип звонка небольшими числами, время – миллисекунды от эпохи.
+    call_id не внешний ключ: история остаётся и после удаления звонка.
+    Пишется пачками через буфер (core/callevents.py). По журналу
+    перестраивается дневная статистика (core/callstats.py).
+    """
+    ADDED = 1
+    NO_ANSWER = 2
+    EXHAUSTED = 3
+    POSTPONED = 4
+    ADJUSTED = 5
+    COMPLETED = 6
+    DELETED = 7
+    CODES = [
+        (ADDED, 'Добавлен'),
+        (NO_ANSWER, 'Недозвон'),
+        (EXHAUSTED, 'Попытки исчерпаны'),
+        (POSTPONED, 'Отложен'),
+        (ADJUSTED, 'Время изменено'),
+        (COMPLETED, 'Выполнен'),
+        (DELETED, 'Удалён'),
+    ]
+    # Тип звонка после события – номер в CallRecord.CALL_TYPES; 0 – неизвестен
+    # (события, записанные до появления поля, по звонку, которого уже нет)
+    CALL_TYPE_CODES = {call_type: n for n, (call_type, _) in enumerate(CallRecord.CALL_TYPES, start=1)}
+    CALL_TYPE_NAMES = {n: call_type for call_type, n in CALL_TYPE_CODES.items()}
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='call_events', db_index=False)
+    call_id = models.BigIntegerField()
+    code = models.PositiveSmallIntegerField(choices=CODES)
+    call_type = models.PositiveSmallIntegerField(
+        choices=[(0, '—')] + [(n, label) for n, (_, label) in enumerate(CallRecord.CALL_TYPES, start=1)],
+        default=0
+    )
+    # Номер попытки звонка после события
+    attempt = models.PositiveSmallIntegerField(default=0)
+    at = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            # История звонка
+            models.Index(fields=['call_id', 'at'], name='call_event_call_idx'),
+            # События оператора за период
+            models.Index(fields=['user', 'at'], name='call_event_user_idx'),
+        ]
+
+
+class CallStat(models.Model):
+    """
+    Дневные счётчики по звонкам оператора для аналитики руководителя.
+    Обновляются изменяющими представлениями в той же транзакции
+    (core/callstats.py), поэтому отчёт читает готовые строки, а не историю.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='call_stats')
+    day = models.DateField()
+    call_type = models.CharField(max_length=20, choices=CallRecord.CALL_TYPES)
+    added = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    # Сумма номеров попыток успешных звонков: среднее = success_attempts / completed
+    success_attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'call_type'], name='call_stat_unique'),
+        ]
+        indexes = [
+            # Отчёт за период по всем операторам
+            models.Index(fields=['day'], name='call_stat_day_idx'),
+        ]
+
+
 class DailyTask(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_tasks')
     date = models.DateField(db_index=True)
@@ -99,11 +259,17 @@ class DailyTask(models.Model):
 
     class Meta:
         ordering = ['date', 'id']
+        indexes = [
+            # Задачи пользователя за диапазон дат (календарь)
+            models.Index(fields=['user', 'date'], name='task_user_date_idx'),
+        ]
 
 
 class Note(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='note')
     content = models.TextField(blank=True)
+    # Растёт при каждом изменении; правки присылаются относительно версии
+    version = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
 
@@ -141,10 +307,61 @@ class HelpTab(models.Model):
         return f'{self.topic.title} - {self.title}'
 
 
-from django.db.models.signals import post_save
+class HelpVersion(models.Model):
+    """
+    Версия справочника – одна строка на всю БД. Увеличивается в транзакции
+    каждого изменения тем и вкладок; страница справочника кэшируется под
+    ключом с этой версией (core/helppage.py), поэтому любой процесс видит
+    правку сразу после её фиксации, какой бы кэш ни был настроен.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if cls.objects.filter(pk=1).update(version=models.F('version') + 1):
+            return
+        _, created = cls.objects.get_or_create(pk=1, defaults={'version': 1})
+        if not created:
+            cls.objects.filter(pk=1).update(version=models.F('version') + 1)
+
+
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
 def create_user_settings(sender, instance, created, **kwargs):
     if created:
-        UserSettings.objects.create(user=instance)
\ No newline at end of file
+        UserSettings.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=UserSettings)
+def drop_cached_user_settings(sender, instance, **kwargs):
+    invalidate_user_settings(instance.user_id)
+
+
+# Поисковый индекс справочника обновляется точечно при каждом изменении
+@receiver(post_save, sender=HelpTab)
+def index_help_tab(sender, instance, **kwargs):
+    helpsearch.index_tabs([instance.id])
+
+
+@receiver(post_delete, sender=HelpTab)
+def unindex_help_tab(sender, instance, **kwargs):
+    helpsearch.remove_tabs([instance.id])
+
+
+@receiver(post_save, sender=HelpTopic)
+def index_help_topic(sender, instance, created, **kwargs):
+    if not created:
+        helpsearch.index_topic(instance.id)
+
+
+# Любое изменение справочника сбрасывает закэшированную страницу
+@receiver([post_save, post_delete], sender=HelpTopic)
+@receiver([post_save, post_delete], sender=HelpTab)
+def drop_cached_help_page(sender, **kwargs):
+    bump_help_version()
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Политика повторных попыток дозвона.
+
+Интервалы из настроек пользователя проверяются один раз при сохранении
+(validate_intervals), а при чтении компилируются в RetryPolicy – массив
+задержек по номеру попытки. Задержка для любой попытки берётся одним
+обращением к массиву; для попыток за последним настроенным шагом
+действует «хвост»: повторять последний интервал, удваивать его до
+потолка или прекратить попытки.
+"""
+import json
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+
+from .utils import ceil_to_minute
+
+DEFAULT_INTERVALS = {1: 20, 2: 30, 3: 60, 4: 120, 5: 240}
+
+TAIL_REPEAT = 'repeat'
+TAIL_BACKOFF = 'backoff'
+TAIL_GIVE_UP = 'give_up'
+TAIL_CHOICES = [
+    (TAIL_REPEAT, 'Повторять последний интервал'),
+    (TAIL_BACKOFF, 'Удваивать интервал до предела'),
+    (TAIL_GIVE_UP, 'Прекратить попытки'),
+]
+
+# Допустимый интервал между попытками, минуты
+MIN_INTERVAL = 1
+MAX_INTERVAL = 7 * 24 * 60
+MAX_STEPS = 50
+# Предел удвоения по умолчанию – сутки
+DEFAULT_BACKOFF_CAP = 24 * 60
+
+
+def validate_intervals(value):
+    """
+    Проверяет интервалы и возвращает их как {номер попытки: минуты}.
+    Принимает словарь или его JSON; номера попыток – подряд с 1.
+    Бросает ValidationError с понятным сообщением.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValidationError('Интервалы должны быть в формате JSON')
+    if not isinstance(value, dict) or not value:
+        raise ValidationError('Укажите хотя бы один интервал')
+    if len(value) > MAX_STEPS:
+        raise ValidationError(f'Не больше {MAX_STEPS} интервалов')
+
+    intervals = {}
+    for key, minutes in value.items():
+        try:
+            attempt = int(key)
+        except (TypeError, ValueError):
+            raise ValidationError(f'Неверный номер попытки: {key}')
+        if isinstance(minutes, bool) or not isinstance(minutes, int):
+            raise ValidationError(f'Интервал после {attempt}-й попытки должен быть целым числом минут')
+        if not MIN_INTERVAL <= minutes <= MAX_INTERVAL:
+            raise ValidationError(
+                f'Интервал после {attempt}-й попытки должен быть от {MIN_INTERVAL} до {MAX_INTERVAL} минут'
+            )
+        intervals[attempt] = minutes
+
+    if sorted(intervals) != list(range(1, len(intervals) + 1)):
+        raise ValidationError('Номера попыток должны идти подряд, начиная с 1')
+    return dict(sorted(intervals.items()))
+
+
+def load_intervals(raw):
+    """
+    Интервалы из БД. Значения, сохранённые до появления проверки, могли
+    быть в одинарных кавычках или вовсе испорчены – тогда берутся
+    интервалы по умолчанию.
+    """
+    if raw:
+        for text in (raw, raw.replace("'", '"')):
+            try:
+                return validate_intervals(text)
+            except ValidationError:
+                continue
+    return dict(DEFAULT_INTERVALS)
+
+
+class RetryPolicy:
+    """
+    Скомпилированная политика: delays[n] – задержка в минутах после n-й
+    попытки. Таблица заранее продлена до точки, где хвост становится
+    постоянным (потолок удвоения или последний интервал), так что
+    delay() – это обращение к массиву или константа.
+    """
+    __slots__ = ('delays', 'tail', 'tail_delay')
+
+    def __init__(self, steps, tail=TAIL_REPEAT, backoff_cap=DEFAULT_BACKOFF_CAP):
+        delays = [None] + list(steps)
+        last = delays[-1]
+        if tail == TAIL_BACKOFF:
+            cap = max(backoff_cap, last)
+            while last < cap:
+                last = min(last * 2, cap)
+                delays.append(last)
+            tail_delay = cap
+        elif tail == TAIL_GIVE_UP:
+            tail_delay = None
+        else:
+            tail_delay = last
+        self.delays = tuple(delays)
+        self.tail = tail
+        self.tail_delay = tail_delay
+
+    @classmethod
+    def from_settings(cls, intervals, tail, backoff_cap):
+        """intervals – уже проверенный словарь {номер попытки: минуты}."""
+        return cls([intervals[n] for n in range(1, len(intervals) + 1)], tail, backoff_cap)
+
+    def __eq__(self, other):
+        return isinstance(other, RetryPolicy) and (self.delays, self.tail) == (other.delays, other.tail)
+
+    def delay(self, attempt_number):
+        """Задержка (минуты) после попытки attempt_number; None – попытки исчерпаны."""
+        if 0 < attempt_number < len(self.delays):
+            return self.delays[attempt_number]
+        return self.tail_delay
+
+    def next_attempt(self, attempt_number, now):
+        """Время следующей попытки после attempt_number или None."""
+        minutes = self.delay(attempt_number)
+        if minutes is None:
+            return None
+        return ceil_to_minute(now + timedelta(minutes=minutes))
+
+    def schedule(self, attempt_numbers, now):
+        """
+        Время следующей попытки для многих звонков сразу. Результат для
+        одинаковых номеров попыток считается один раз.
+        """
+        computed = {}
+        result = []
+        for attempt_number in attempt_numbers:
+            if attempt_number not in computed:
+                computed[attempt_number] = self.next_attempt(attempt_number, now)
+            result.append(computed[attempt_number])
+        return result
@@ -0,0 +1,184 @@
+"""
+Планировщик наступивших звонков.
+
+Отдельный процесс (manage.py run_call_scheduler) держит в памяти кучу
+ближайших звонков и просыпается ровно к моменту следующего из них.
+Наступившие звонки помечаются notified_at пачкой и публикуются в таблицу
+DueCallEvent, откуда их забирают веб-процессы.
+
+Веб-процессы сообщают планировщику об изменении звонков UDP-датаграммой
+с их id (notify_scheduler), и куча обновляется точечно, без полного
+пересканирования. Потерянная датаграмма не страшна: раз в
+CALL_SCHEDULER_RESYNC секунд куча перестраивается целиком.
+"""
+import heapq
+import logging
+import select
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import CallRecord, DueCallEvent
+from .utils import ceil_to_minute, floor_to_minute
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на число параметров в одном запросе SQLite
+BATCH_SIZE = 500
+
+
+def notify_scheduler(*call_ids):
+    """
+    Сообщает планировщику, что звонки изменились.
+    Ничего не делает, если планировщик выключен; ошибки сети игнорируются.
+    """
+    if not settings.CALL_SCHEDULER_ENABLED or not call_ids:
+        return
+    payload = ','.join(str(i) for i in call_ids).encode('ascii')
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(payload, (settings.CALL_SCHEDULER_HOST, settings.CALL_SCHEDULER_PORT))
+    except OSError:
+        logger.warning('Не удалось уведомить планировщик о звонках %s', call_ids)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CallScheduler:
+    """Куча (время звонка, id) с ленивым удалением устаревших записей."""
+
+    def __init__(self):
+        self.heap = []
+        # id звонка -> актуальное время next_attempt; записи кучи,
+        # не совпадающие с этим словарём, считаются устаревшими
+        self.pending = {}
+
+    def load_all(self):
+        """Полностью перестраивает кучу по неуведомлённым звонкам."""
+        rows = CallRecord.objects.filter(notified_at__isnull=True).values_list('id', 'next_attempt')
+        self.pending = {call_id: next_attempt for call_id, next_attempt in rows.iterator()}
+        self.heap = [(next_attempt, call_id) for call_id, next_attempt in self.pending.items()]
+        heapq.heapify(self.heap)
+
+    def refresh(self, call_ids):
+        """Точечно обновляет кучу для изменённых (или удалённых) звонков."""
+        for chunk in _chunks(list(call_ids)):
+            found = set()
+            rows = CallRecord.objects.filter(id__in=chunk).values_list('id', 'next_attempt', 'notified_at')
+            for call_id, next_attempt, notified_at in rows:
+                found.add(call_id)
+                if notified_at is not None:
+                    self.pending.pop(call_id, None)
+                elif self.pending.get(call_id) != next_attempt:
+                    self.pending[call_id] = next_attempt
+                    heapq.heappush(self.heap, (next_attempt, call_id))
+            for call_id in set(chunk) - found:
+                self.pending.pop(call_id, None)
+
+    def next_due(self):
+        """Время ближайшего звонка или None, если очередь пуста."""
+        while self.heap:
+            next_attempt, call_id = self.heap[0]
+            if self.pending.get(call_id) == next_attempt:
+                return ceil_to_minute(next_attempt)
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now):
+        """Снимает с кучи все звонки, наступившие к моменту now."""
+        due = []
+        while True:
+            next_due = self.next_due()
+            if next_due is None or next_due > now:
+                return due
+            _, call_id = heapq.heappop(self.heap)
+            del self.pending[call_id]
+            due.append(call_id)
+
+    def fire(self, call_ids, now):
+        """
+        Помечает звонки уведомлёнными и публикует события.
+        Условие в UPDATE защищает от звонков, перенесённых или удалённых
+        после попадания в кучу.
+        """
+        published = 0
+        for chunk in _chunks(call_ids):
+            with transaction.atomic():
+                CallRecord.objects.filter(
+                    id__in=chunk,
+                    notified_at__isnull=True,
+                    next_attempt__lte=floor_to_minute(now)
+                ).update(notified_at=now)
+                claimed = CallRecord.objects.filter(id__in=chunk, notified_at=now).values_list('id', 'user_id')
+                events = [DueCallEvent(user_id=user_id, call_id=call_id) for call_id, user_id in claimed]
+                DueCallEvent.objects.bulk_create(events)
+                published += len(events)
+        return published
+
+    def purge_delivered(self, now):
+        """Удаляет доставленные события старше суток."""
+        DueCallEvent.objects.filter(
+            delivered_at__lt=now - timedelta(days=1)
+        ).delete()
+
+    def run(self, stop_after=None):
+        """
+        Основной цикл. stop_after – ограничение времени работы в секундах
+        (для отладки); по умолчанию цикл бесконечный.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((settings.CALL_SCHEDULER_HOST, settings.CALL_SCHEDULER_PORT))
+        sock.setblocking(False)
+        resync_every = settings.CALL_SCHEDULER_RESYNC
+        started = time.monotonic()
+
+        try:
+            self.load_all()
+            last_resync = time.monotonic()
+            logger.info('Планировщик запущен, в очереди %d звонков', len(self.pending))
+
+            while stop_after is None or time.monotonic() - started < stop_after:
+                timeout = resync_every - (time.monotonic() - last_resync)
+                next_due = self.next_due()
+                if next_due is not None:
+                    timeout = min(timeout, (next_due - timezone.now()).total_seconds())
+                if stop_after is not None:
+                    timeout = min(timeout, stop_after - (time.monotonic() - started))
+                readable, _, _ = select.select([sock], [], [], max(timeout, 0))
+
+                close_old_connections()
+                if readable:
+                    self.refresh(self._drain(sock))
+
+                now = timezone.now()
+                due = self.pop_due(now)
+                if due:
+                    published = self.fire(due, now)
+                    logger.info('Наступило звонков: %d, опубликовано событий: %d', len(due), published)
+
+                if time.monotonic() - last_resync >= resync_every:
+                    self.load_all()
+                    self.purge_delivered(now)
+                    last_resync = time.monotonic()
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _drain(sock):
+        """Читает все накопившиеся датаграммы и возвращает множество id."""
+        call_ids = set()
+        while True:
+            try:
+                payload, _ = sock.recvfrom(65535)
+            except BlockingIOError:
+                return call_ids
+            for part in payload.decode('ascii', 'ignore').split(','):
+                if part.isdigit():
+                    call_ids.add(int(part))
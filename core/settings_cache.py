@@ -0,0 +1,162 @@
+"""
+Кэш настроек пользователя.
+
+Настройки нужны почти каждому изменению звонка (интервалы перезвона), а
+меняются редко. Поэтому они хранятся в уже разобранном неизменяемом виде
+(UserSettingsSnapshot) в двух уровнях:
+
+1. LRU-кэш в памяти процесса – без обращения к чему-либо вообще;
+2. необязательно – общий кэш Django (USER_SETTINGS_SHARED_CACHE), чтобы
+   другие процессы не ходили за настройками в БД.
+
+При сохранении или удалении UserSettings запись сбрасывается в обоих
+уровнях (сигналы в models.py). Другие процессы узнают об изменении не
+позже чем через USER_SETTINGS_LOCAL_TTL секунд – столько живёт запись в
+их локальном кэше. Поэтому ответы, которые браузер хранит по ETag версии
+данных (страница настроек, календарь), читают настройки с fresh=True –
+прямо из БД: иначе новый ETag мог бы закрепить у клиента старые настройки.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .retry import RetryPolicy, load_intervals
+
+
+@dataclass(frozen=True)
+class UserSettingsSnapshot:
+    """Разобранные настройки пользователя, только для чтения."""
+    user_id: int
+    schedule_type: str
+    first_work_date: Optional[date]
+    intervals: tuple  # пары (номер попытки, минуты)
+    retry_tail: str
+    retry_backoff_cap: int
+    retry_policy: RetryPolicy
+    callbacks_in_work_time: bool
+    sound_enabled: bool
+    volume: int
+    dark_theme: bool
+
+    @classmethod
+    def from_model(cls, obj):
+        intervals = load_intervals(obj.intervals)
+        return cls(
+            user_id=obj.user_id,
+            schedule_type=obj.schedule_type,
+            first_work_date=obj.first_work_date,
+            intervals=tuple(intervals.items()),
+            retry_tail=obj.retry_tail,
+            retry_backoff_cap=obj.retry_backoff_cap,
+            retry_policy=RetryPolicy.from_settings(intervals, obj.retry_tail, obj.retry_backoff_cap),
+            callbacks_in_work_time=obj.callbacks_in_work_time,
+            sound_enabled=obj.sound_enabled,
+            volume=obj.volume,
+            dark_theme=obj.dark_theme,
+        )
+
+    def get_intervals_dict(self):
+        return dict(self.intervals)
+
+
+class SettingsCache:
+    """Потокобезопасный LRU с ограниченным временем жизни записей."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            snapshot, expires = item
+            if expires < time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return snapshot
+
+    def set(self, user_id, snapshot):
+        with self._lock:
+            self._data[user_id] = (snapshot, time.monotonic() + self.ttl)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = SettingsCache(settings.USER_SETTINGS_CACHE_SIZE, settings.USER_SETTINGS_LOCAL_TTL)
+
+
+def _shared_cache():
+    alias = settings.USER_SETTINGS_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def _shared_key(user_id):
+    return f'core:user_settings:{user_id}'
+
+
+def _load_snapshot(user):
+    from .models import UserSettings
+    obj, _ = UserSettings.objects.get_or_create(user=user)
+    return UserSettingsSnapshot.from_model(obj)
+
+
+def get_settings_snapshot(user, fresh=False):
+    """
+    Настройки пользователя из кэша; при промахе – из БД (с созданием).
+    fresh=True – всегда из БД, кэш не читается и не заполняется.
+    """
+    if fresh:
+        return _load_snapshot(user)
+
+    snapshot = local_cache.get(user.pk)
+    if snapshot is not None:
+        return snapshot
+
+    shared = _shared_cache()
+    if shared is not None:
+        snapshot = shared.get(_shared_key(user.pk))
+
+    if snapshot is None:
+        snapshot = _load_snapshot(user)
+        if shared is not None:
+            shared.set(_shared_key(user.pk), snapshot, settings.USER_SETTINGS_SHARED_TTL)
+
+    local_cache.set(user.pk, snapshot)
+    return snapshot
+
+
+def invalidate_user_settings(user_id):
+    """
+    Сбрасывает настройки пользователя в обоих уровнях кэша – сразу и ещё
+    раз после фиксации транзакции, чтобы параллельный запрос не успел
+    положить в кэш старое значение.
+    """
+    def drop():
+        local_cache.delete(user_id)
+        shared = _shared_cache()
+        if shared is not None:
+            shared.delete(_shared_key(user_id))
+
+    drop()
+    transaction.on_commit(drop)
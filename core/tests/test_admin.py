@@ -0,0 +1,48 @@
+"""Правки данных оператора в админке Django меняют его версию данных (ETag)."""
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import CallRecord, DataVersion
+
+
+class AdminDataVersionTests(TestCase):
+
+    def setUp(self):
+        self.operator = User.objects.create_user('operator', password='pw')
+        self.admin = User.objects.create_superuser('admin', password='pw')
+        self.client.force_login(self.admin)
+        now = timezone.now()
+        self.call = CallRecord.objects.create(
+            user=self.operator, comment='Звонок', phone='89991234567', first_attempt=now, next_attempt=now
+        )
+
+    def test_delete_bumps_owner_version(self):
+        before = DataVersion.current(self.operator)
+
+        response = self.client.post(f'/admin/core/callrecord/{self.call.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(CallRecord.objects.exists())
+        self.assertGreater(DataVersion.current(self.operator), before)
+
+    def test_bulk_delete_bumps_owner_version(self):
+        before = DataVersion.current(self.operator)
+
+        self.client.post('/admin/core/callrecord/', {
+            'action': 'delete_selected', '_selected_action': [self.call.pk], 'post': 'yes',
+        })
+
+        self.assertFalse(CallRecord.objects.exists())
+        self.assertGreater(DataVersion.current(self.operator), before)
+
+    def test_reassign_bumps_both_users(self):
+        other = User.objects.create_user('other', password='pw')
+        before = DataVersion.current(self.operator), DataVersion.current(other)
+
+        self.call.user = other
+        admin.site._registry[CallRecord].save_model(None, self.call, None, change=True)
+
+        self.assertGreater(DataVersion.current(self.operator), before[0])
+        self.assertGreater(DataVersion.current(other), before[1])
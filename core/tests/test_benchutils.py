@@ -0,0 +1,20 @@
+"""Помощники бенчмарков не меняют настройки проекта за пределами замера."""
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core.benchutils import HOST, allow_bench_host, percentile
+
+
+class BenchUtilsTests(SimpleTestCase):
+
+    def test_percentile(self):
+        values = [0.4, 0.1, 0.3, 0.2]
+        self.assertEqual(percentile(values, 0.5), 0.3)
+        self.assertEqual(percentile(values, 0.99), 0.4)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    @override_settings(ALLOWED_HOSTS=['example.com'])
+    def test_host_is_allowed_only_inside_context(self):
+        with allow_bench_host():
+            self.assertEqual(settings.ALLOWED_HOSTS, ['example.com', HOST])
+        self.assertEqual(settings.ALLOWED_HOSTS, ['example.com'])
@@ -0,0 +1,36 @@
+"""Буфер журнала событий и его сброс в конце запроса."""
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase
+
+from core import callevents
+from core.callevents import CallEventMiddleware, EventBuffer, buffer
+from core.models import CallEvent
+
+
+class CallEventMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+
+        async def view(request):
+            return HttpResponse()
+        self.middleware = CallEventMiddleware(view)
+
+    def test_empty_buffer_does_not_switch_to_thread(self):
+        self.assertEqual(EventBuffer.pending, 0)
+        with mock.patch.object(callevents, 'sync_to_async') as to_thread:
+            async_to_sync(self.middleware)(None)
+        to_thread.assert_not_called()
+
+    def test_pending_events_are_flushed(self):
+        buffer.extend([CallEvent(user=self.user, call_id=1, code=CallEvent.ADDED, at=0)])
+        self.assertEqual(EventBuffer.pending, 1)
+
+        async_to_sync(self.middleware)(None)
+
+        self.assertEqual(EventBuffer.pending, 0)
+        self.assertEqual(CallEvent.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,49 @@
+"""«Недозвон» для нескольких звонков: число запросов не зависит от их количества."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import CallRecord, UserSettings
+from core.retry import TAIL_GIVE_UP
+
+
+class UpdateCallTimeBatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        # Попытки после пятой не назначаются: часть звонков станет «Исчерпан»
+        UserSettings.objects.filter(user=self.user).update(retry_tail=TAIL_GIVE_UP)
+        self.client.force_login(self.user)
+
+    def make_calls(self, count):
+        now = timezone.now()
+        calls = CallRecord.objects.bulk_create([
+            CallRecord(user=self.user, comment='Звонок', phone='89991234567', first_attempt=now,
+                       next_attempt=now, attempt_number=5 if n % 2 else 1)
+            for n in range(count)
+        ])
+        return [call.id for call in calls]
+
+    def mark(self, ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/calls/update_batch/', {'ids[]': ids})
+        self.assertEqual(response.json()['updated'], len(ids))
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.mark(self.make_calls(2))  # строки статистики за день уже есть
+        self.assertEqual(self.mark(self.make_calls(5)), self.mark(self.make_calls(50)))
+
+    def test_exhausted_calls_keep_their_time(self):
+        ids = self.make_calls(2)
+        before = dict(CallRecord.objects.filter(id__in=ids).values_list('id', 'next_attempt'))
+
+        self.mark(ids)
+
+        calls = {call.id: call for call in CallRecord.objects.filter(id__in=ids)}
+        self.assertEqual(calls[ids[0]].call_type, 'Перезвон')
+        self.assertEqual(calls[ids[1]].call_type, 'Исчерпан')
+        self.assertEqual(calls[ids[1]].next_attempt, before[ids[1]])
+        self.assertIsNotNone(calls[ids[1]].notified_at)
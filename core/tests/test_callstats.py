@@ -0,0 +1,102 @@
+"""Перестроение дневной статистики по журналу событий совпадает с приращениями представлений."""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.callevents import buffer, epoch_ms
+from core.callstats import STAT_FIELDS, rebuild
+from core.models import CallEvent, CallRecord, CallStat, TrackingRecord, UserSettings
+from core.settings_cache import local_cache
+
+
+class RebuildCallStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        # Вторая попытка – последняя: после неё звонок становится «Исчерпан»
+        UserSettings.objects.filter(user=self.user).update(intervals='{"1": 20, "2": 30}', retry_tail='give_up')
+        local_cache.clear()
+        self.addCleanup(local_cache.clear)
+        self.client.force_login(self.user)
+        self.today = timezone.localdate()
+
+    def post(self, name, data):
+        # События попадают в буфер после фиксации транзакции представления
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name), data)
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    def stats(self):
+        return {
+            (stat.user_id, stat.day, stat.call_type): tuple(getattr(stat, field) for field in STAT_FIELDS)
+            for stat in CallStat.objects.all()
+        }
+
+    def work_day(self):
+        """Все изменяющие действия оператора, которые ведут статистику."""
+        soon = (timezone.localtime() + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M')
+        ids = [
+            self.post('add_call', {'comment': f'Звонок {n}', 'phone': '89991234567'}).json()['id']
+            for n in range(4)
+        ]
+        ids.append(self.post('add_call', {
+            'comment': 'Перезвон', 'phone': '89991234567', 'call_type': 'Перезвон', 'next_attempt': soon,
+        }).json()['id'])
+        tracking = self.post('add_tracking', {
+            'claim': 'З-1', 'phone': '89991234567', 'crm': '1', 'connection_datetime': soon,
+        }).json()
+
+        self.post('update_call_time', {'id': ids[0]})
+        self.post('update_call_time_batch', {'ids[]': ids[:3]})  # ids[0] исчерпан
+        self.post('complete_call', {'id': ids[1]})
+        self.post('complete_call', {'id': tracking['call_id']})
+        self.post('delete_calls', {'ids[]': [ids[2], ids[3]]})
+        self.post('import_calls_file', {
+            'file': SimpleUploadedFile('calls.csv', 'comment,phone\nА,89991234567\nБ,89991234568\n'.encode()),
+        })
+        self.post('add_tracking', {
+            'claim': 'З-2', 'phone': '89991234567', 'crm': '2', 'connection_datetime': soon,
+        })
+        second = TrackingRecord.objects.get(claim='З-2')
+        self.post('delete_tracking', {'ids[]': [second.id]})
+        self.post('clear_all_records', {})
+        buffer.flush()
+
+    def test_rebuild_matches_incremental_counters(self):
+        self.work_day()
+        expected = self.stats()
+        self.assertEqual(
+            {call_type for _, _, call_type in expected},
+            {'Недозвон', 'Перезвон', 'Отслеживание', 'Исчерпан'}
+        )
+        self.assertFalse(CallRecord.objects.filter(user=self.user).exists())
+
+        self.assertEqual(rebuild(), (len(expected), 0))
+
+        self.assertEqual(self.stats(), expected)
+
+    def test_rebuild_replaces_rows_of_period_only(self):
+        self.work_day()
+        expected = self.stats()
+        yesterday = self.today - timedelta(days=1)
+        kept = CallStat.objects.create(user=self.user, day=yesterday, call_type='Недозвон', added=5)
+        CallStat.objects.filter(user=self.user, day=self.today).update(added=100, deleted=0)
+
+        rebuild(date_from=self.today, date_to=self.today)
+
+        kept.refresh_from_db()
+        self.assertEqual(kept.added, 5)
+        rebuilt = self.stats()
+        del rebuilt[self.user.pk, yesterday, 'Недозвон']
+        self.assertEqual(rebuilt, expected)
+
+    def test_events_without_call_type_are_skipped(self):
+        CallEvent.objects.create(user=self.user, call_id=1, code=CallEvent.ADDED, at=epoch_ms(timezone.now()))
+
+        self.assertEqual(rebuild(), (0, 1))
+        self.assertFalse(CallStat.objects.exists())
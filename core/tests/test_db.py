@@ -0,0 +1,89 @@
+"""@read_connection действует и пока выдаётся тело потокового ответа."""
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from core import async_views, views
+from core.db import _read_state, read_connection
+
+
+class ReadConnectionStreamingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.seen = []
+
+    def body(self):
+        for chunk in (b'a', b'b'):
+            self.seen.append(_read_state.get())
+            yield chunk
+
+    async def abody(self):
+        for chunk in (b'a', b'b'):
+            self.seen.append(_read_state.get())
+            yield chunk
+
+    def test_sync_stream_keeps_read_state(self):
+        view = read_connection(lambda request: StreamingHttpResponse(self.body()))
+
+        response = view(self.request)
+        self.assertIsNone(_read_state.get())
+
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        self.assertEqual(self.seen, [{'wrote': False}] * 2)
+        self.assertIsNone(_read_state.get())
+
+    def test_async_stream_keeps_read_state(self):
+        @read_connection
+        async def view(request):
+            return StreamingHttpResponse(self.abody())
+
+        async def consume():
+            response = await view(self.request)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(consume)(), b'ab')
+        self.assertEqual(self.seen, [{'wrote': False}] * 2)
+
+    def test_write_during_stream_is_remembered(self):
+        def body():
+            yield b'a'
+            _read_state.get()['wrote'] = True
+            yield b'b'
+            self.seen.append(_read_state.get())
+
+        response = read_connection(lambda request: StreamingHttpResponse(body()))(self.request)
+        list(response.streaming_content)
+
+        self.assertEqual(self.seen, [{'wrote': True}])
+
+
+class WritingEndpointsTests(TestCase):
+    """Эндпоинты, которые пишут, читают из основного подключения с первого запроса."""
+
+    def setUp(self):
+        self.request = RequestFactory().get('/api/notifications/')
+        self.request.user = User.objects.create_user('operator', password='pw')
+        self.states = []
+
+    def collect(self, user, now):
+        self.states.append(_read_state.get())
+        return []
+
+    async def acollect(self, user, now):
+        return self.collect(user, now)
+
+    def test_notifications_do_not_use_read_connection(self):
+        with mock.patch.object(views, 'collect_due_notifications', self.collect):
+            response = views.get_notifications(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.states, [None])
+
+    def test_async_notifications_do_not_use_read_connection(self):
+        with mock.patch.object(async_views, 'collect_due_notifications', self.acollect):
+            response = async_to_sync(async_views.get_notifications)(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.states, [None])
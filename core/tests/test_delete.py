@@ -0,0 +1,91 @@
+"""
+Удаление звонков множествами: число запросов не зависит от того, сколько
+звонков удаляется, и каждая таблица меняется одним запросом.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import CallRecord, DeletedRecord, DueCallEvent, TrackingRecord
+from core.views import DELETE_CHUNK_SIZE, delete_records
+
+
+class DeleteRecordsTests(TestCase):
+
+    def make_user(self, username, calls, linked=50):
+        """Пользователь с calls звонками; у первых linked – заявка и событие планировщика."""
+        user = User.objects.create_user(username, password='pw')
+        now = timezone.now()
+        records = CallRecord.objects.bulk_create([
+            CallRecord(user=user, comment='Звонок', phone='89991234567', first_attempt=now, next_attempt=now)
+            for _ in range(calls)
+        ])
+        TrackingRecord.objects.bulk_create([
+            TrackingRecord(user=user, claim='З-1', crm='1', connection_datetime=now, call_record=call)
+            for call in records[:linked]
+        ])
+        DueCallEvent.objects.bulk_create([DueCallEvent(user=user, call=call) for call in records[:linked]])
+        return user
+
+    def delete(self, user, tracking=None):
+        calls = CallRecord.objects.filter(user=user)
+        if tracking is None:
+            tracking = TrackingRecord.objects.filter(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            deleted = delete_records(user, calls, tracking)
+        return deleted, [query['sql'] for query in queries.captured_queries]
+
+    def test_each_table_is_changed_by_one_statement(self):
+        user = self.make_user('operator', 600)
+        deleted, statements = self.delete(user)
+
+        self.assertEqual(deleted, (600, 50))
+        for table in ('core_callrecord', 'core_duecallevent', 'core_trackingrecord'):
+            self.assertEqual(
+                sum(sql.startswith(f'DELETE FROM "{table}"') for sql in statements), 1, table
+            )
+        self.assertFalse(CallRecord.objects.filter(user=user).exists())
+        self.assertFalse(TrackingRecord.objects.filter(user=user).exists())
+        self.assertFalse(DueCallEvent.objects.filter(user=user).exists())
+        self.assertEqual(DeletedRecord.objects.filter(user=user, kind='call').count(), 600)
+
+    def test_large_selection_is_deleted_in_chunks(self):
+        user = self.make_user('operator', DELETE_CHUNK_SIZE + 10)
+        deleted, statements = self.delete(user)
+
+        self.assertEqual(deleted, (DELETE_CHUNK_SIZE + 10, 50))
+        self.assertEqual(sum(sql.startswith('DELETE FROM "core_callrecord"') for sql in statements), 2)
+        self.assertFalse(CallRecord.objects.filter(user=user).exists())
+
+    def test_query_count_does_not_grow_with_selection(self):
+        _, small = self.delete(self.make_user('small', 150))
+        _, large = self.delete(self.make_user('large', 600))
+
+        # «Надгробия» bulk_create пишет пачками по лимиту параметров SQLite
+        def without_tombstones(statements):
+            return [sql for sql in statements if not sql.startswith('INSERT INTO "core_deletedrecord"')]
+
+        self.assertEqual(len(without_tombstones(small)), len(without_tombstones(large)))
+
+    def test_tracking_outside_selection_loses_its_call(self):
+        user = self.make_user('operator', 10, linked=1)
+        tracking = TrackingRecord.objects.get(user=user)
+
+        deleted, _ = self.delete(user, tracking=TrackingRecord.objects.none())
+
+        self.assertEqual(deleted, (10, 0))
+        tracking.refresh_from_db()
+        self.assertIsNone(tracking.call_record_id)
+
+    def test_delete_view_removes_linked_tracking(self):
+        user = self.make_user('operator', 3, linked=1)
+        self.client.force_login(user)
+        ids = list(CallRecord.objects.filter(user=user).values_list('id', flat=True))
+
+        response = self.client.post('/api/calls/delete/', {'ids[]': ids})
+
+        self.assertEqual(response.json()['deleted_calls'], 3)
+        self.assertEqual(response.json()['deleted_tracking'], 1)
+        self.assertFalse(CallRecord.objects.filter(user=user).exists())
@@ -0,0 +1,32 @@
+"""Версия справочника в БД: правку видят и процессы со своим кэшем в памяти."""
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase
+
+from core.helppage import get_help_version, render_help_accordion
+from core.models import HelpTab, HelpTopic, HelpVersion
+
+
+class HelpPageCacheTests(TestCase):
+
+    def setUp(self):
+        self.topic = HelpTopic.objects.create(title='Тема', order=1)
+        self.addCleanup(caches[settings.HELP_PAGE_CACHE].clear)
+
+    def test_edit_bumps_version_in_database(self):
+        before = HelpVersion.current()
+
+        HelpTab.objects.create(topic=self.topic, title='Вкладка', content='Текст')
+
+        self.assertGreater(HelpVersion.current(), before)
+        self.assertEqual(get_help_version(), HelpVersion.current())
+
+    def test_other_process_edit_refreshes_cached_page(self):
+        tab = HelpTab.objects.create(topic=self.topic, title='Вкладка', content='Старый текст')
+        self.assertIn('Старый текст', render_help_accordion())
+
+        # Правка в другом процессе: его сигналы не трогают наш кэш, меняется только строка версии
+        HelpTab.objects.filter(pk=tab.pk).update(content='Новый текст')
+        HelpVersion.bump()
+
+        self.assertIn('Новый текст', render_help_accordion())
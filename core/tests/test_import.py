@@ -0,0 +1,90 @@
+"""Импорт звонков из файла: ошибки файла – ответ 400, а не 500; журнал событий."""
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.importer import import_calls
+from core.models import CallEvent, CallRecord
+
+
+class ImportCallsFileTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='calls.csv'):
+        return self.client.post('/api/calls/import/', {'file': SimpleUploadedFile(name, content)})
+
+    def test_valid_file_is_imported(self):
+        response = self.upload('comment,phone\nПерезвонить,89991234567\n'.encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_non_utf8_file_is_rejected(self):
+        response = self.upload('comment,phone\nПерезвонить,89991234567\n'.encode('cp1251'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CallRecord.objects.exists())
+
+    def test_encoding_error_after_first_batches_rolls_back(self):
+        content = b'comment,phone\n' + b'ok,89991234567\n' * 3000 + 'ошибка,1\n'.encode('cp1251')
+        self.assertEqual(self.upload(content).status_code, 400)
+        self.assertFalse(CallRecord.objects.exists())
+
+    def test_malformed_csv_is_rejected(self):
+        response = self.upload(b'comment,phone\n"' + b'x' * 200000 + b'",89991234567\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Строка 2', response.content.decode())
+
+
+class ImportCallEventsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+
+    def rows(self, count):
+        yield ['comment', 'phone']
+        for n in range(count):
+            yield [f'Звонок {n}', '89991234567']
+
+    def test_every_imported_call_gets_added_event(self):
+        other = User.objects.create_user('other', password='pw')
+        import_calls(other, self.rows(3))
+
+        result = import_calls(self.user, self.rows(25), batch_size=10)
+
+        self.assertEqual(result.created, 25)
+        events = CallEvent.objects.filter(user=self.user)
+        self.assertEqual(
+            set(events.values_list('call_id', flat=True)),
+            set(CallRecord.objects.filter(user=self.user).values_list('id', flat=True))
+        )
+        self.assertEqual(set(events.values_list('code', 'attempt')), {(CallEvent.ADDED, 1)})
+
+    def test_imported_calls_are_not_read_back(self):
+        with CaptureQueriesContext(connection) as queries:
+            import_calls(self.user, self.rows(25), batch_size=10)
+
+        reads = [q['sql'] for q in queries.captured_queries
+                 if q['sql'].startswith('SELECT') and 'FROM "core_callrecord"' in q['sql']]
+        self.assertEqual(reads, [])
+
+    def test_call_added_during_import_gets_no_import_event(self):
+        def rows():
+            for n, row in enumerate(self.rows(25)):
+                if n == 15:
+                    # Оператор добавил звонок вручную, пока шёл импорт
+                    now = timezone.now()
+                    self.manual = CallRecord.objects.create(
+                        user=self.user, comment='Вручную', phone='89990000000', first_attempt=now, next_attempt=now
+                    )
+                yield row
+
+        result = import_calls(self.user, rows(), batch_size=10)
+
+        self.assertEqual(result.created, 25)
+        imported = set(CallRecord.objects.filter(user=self.user).exclude(pk=self.manual.pk).values_list('id', flat=True))
+        self.assertEqual(set(CallEvent.objects.filter(user=self.user).values_list('call_id', flat=True)), imported)
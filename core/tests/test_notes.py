@@ -0,0 +1,60 @@
+"""
+Сохранение заметки с версиями: правка устаревшей версии не затирает
+чужую, а получает 409 с актуальным текстом.
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from core.models import Note
+
+
+class SaveNoteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        self.client.force_login(self.user)
+        self.note = Note.objects.create(user=self.user, content='Привет, мир', version=3)
+
+    def save(self, **data):
+        return self.client.post('/api/note/save/', data)
+
+    def test_patch_applies_to_current_version(self):
+        response = self.save(base_version=3, start=0, end=6, text='Пока')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 4)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, 'Пока, мир')
+        self.assertEqual(self.note.version, 4)
+
+    def test_patch_of_stale_version_conflicts(self):
+        response = self.save(base_version=2, start=0, end=6, text='Пока')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'status': 'conflict', 'version': 3, 'content': 'Привет, мир'})
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, 'Привет, мир')
+
+    def test_second_patch_of_same_version_conflicts(self):
+        self.assertEqual(self.save(base_version=3, start=0, end=6, text='Пока').status_code, 200)
+        response = self.save(base_version=3, start=0, end=6, text='Здравствуй')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['content'], 'Пока, мир')
+
+    def test_concurrent_save_loses_conditional_update(self):
+        # Запрос прочитал версию 3, а другой запрос тем временем сохранил версию 4
+        stale = Note.objects.get(pk=self.note.pk)
+        Note.objects.filter(pk=self.note.pk).update(content='Чужая правка', version=4)
+        with mock.patch.object(Note.objects, 'get_or_create', return_value=(stale, False)):
+            response = self.save(base_version=3, start=0, end=6, text='Пока')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'status': 'conflict', 'version': 4, 'content': 'Чужая правка'})
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, 'Чужая правка')
+
+    def test_patch_without_base_version_is_rejected(self):
+        self.assertEqual(self.save(start=0, end=0, text='x').status_code, 400)
+
+    def test_unchanged_content_is_not_written(self):
+        response = self.save(base_version=3, content='Привет, мир')
+        self.assertEqual(response.json(), {'status': 'ok', 'version': 3, 'changed': False})
@@ -0,0 +1,128 @@
+"""
+Захват уведомлений условным UPDATE: один наступивший звонок (или событие
+планировщика) доставляется ровно одному запросу, даже если несколько
+запросов нашли его одновременно.
+"""
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import async_views, views
+from core.models import CallRecord, DueCallEvent
+
+
+class ClaimDueCallsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        self.now = timezone.now()
+        self.call = CallRecord.objects.create(
+            user=self.user,
+            comment='Перезвонить',
+            phone='89991234567',
+            first_attempt=self.now - timedelta(hours=1),
+            next_attempt=self.now - timedelta(minutes=5),
+        )
+
+    def test_due_call_is_delivered_once(self):
+        first = views.collect_due_notifications(self.user, self.now)
+        second = views.collect_due_notifications(self.user, self.now + timedelta(seconds=1))
+        self.assertEqual([item['id'] for item in first], [self.call.id])
+        self.assertEqual(second, [])
+
+    def test_concurrent_claim_loses_to_earlier_one(self):
+        # Запрос A нашёл звонок, но запрос B успел забрать его раньше
+        due_ids = list(views.due_calls(self.user, self.now))
+        delivered = views.collect_due_notifications(self.user, self.now + timedelta(seconds=1))
+
+        claimed = views.claim_due_calls(due_ids).update(notified_at=self.now)
+
+        self.assertEqual([item['id'] for item in delivered], [self.call.id])
+        self.assertEqual(claimed, 0)
+        self.assertFalse(views.claimed_calls(due_ids, self.now).exists())
+
+    def test_stream_waits_until_next_call(self):
+        self.call.next_attempt = self.now + timedelta(seconds=2)
+        self.call.save()
+        wait = views.notification_stream_wait(self.user, self.now, time.monotonic() + 60)
+        self.assertLessEqual(wait, settings.NOTIFICATION_STREAM_RECHECK)
+        self.assertGreater(wait, 0)
+        self.assertIsNone(views.notification_stream_wait(self.user, self.now, time.monotonic() - 1))
+
+    @override_settings(NOTIFICATION_STREAM_RECHECK=5)
+    def test_stream_rechecks_at_least_every_second(self):
+        # Ближайший звонок через час, но новый звонок «на сейчас» может появиться в любой момент
+        self.call.next_attempt = self.now + timedelta(hours=1)
+        self.call.save()
+        wait = views.notification_stream_wait(self.user, self.now, time.monotonic() + 60)
+        self.assertEqual(wait, views.NOTIFICATION_STREAM_MAX_WAIT)
+
+    def test_future_call_is_not_claimed(self):
+        self.call.next_attempt = self.now + timedelta(minutes=5)
+        self.call.save()
+        self.assertEqual(views.collect_due_notifications(self.user, self.now), [])
+        self.call.refresh_from_db()
+        self.assertIsNone(self.call.notified_at)
+
+    def test_polling_endpoint_delivers_once(self):
+        self.client.force_login(self.user)
+        first = self.client.get('/api/notifications/').json()['notifications']
+        second = self.client.get('/api/notifications/').json()['notifications']
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+
+
+@override_settings(CALL_SCHEDULER_ENABLED=True)
+class ClaimDueEventsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        self.now = timezone.now()
+        call = CallRecord.objects.create(
+            user=self.user,
+            comment='Перезвонить',
+            phone='89991234567',
+            first_attempt=self.now - timedelta(hours=1),
+            next_attempt=self.now - timedelta(minutes=5),
+            notified_at=self.now,
+        )
+        self.event = DueCallEvent.objects.create(user=self.user, call=call)
+
+    def test_event_is_delivered_once(self):
+        first = views.collect_due_notifications(self.user, self.now)
+        second = views.collect_due_notifications(self.user, self.now + timedelta(seconds=1))
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+
+    def test_concurrent_claim_loses_to_earlier_one(self):
+        event_ids = list(views.due_events(self.user))
+        delivered = views.collect_due_notifications(self.user, self.now + timedelta(seconds=1))
+
+        claimed = views.claim_due_events(event_ids).update(delivered_at=self.now)
+
+        self.assertEqual(len(delivered), 1)
+        self.assertEqual(claimed, 0)
+        self.assertFalse(views.claimed_events(event_ids, self.now).exists())
+
+    def test_stream_wait_does_not_scan_calls(self):
+        # Время ближайшего звонка знает планировщик; поток только ждёт событий
+        with self.assertNumQueries(0):
+            wait = views.notification_stream_wait(self.user, self.now, time.monotonic() + 60)
+        self.assertEqual(wait, views.NOTIFICATION_STREAM_MAX_WAIT)
+
+    def test_async_stream_uses_shared_wait(self):
+        async def consume():
+            return [chunk async for chunk in async_views.notification_events(self.user)]
+
+        with mock.patch.object(views, 'notification_stream_wait', return_value=None) as stream_wait:
+            chunks = async_to_sync(consume)()
+
+        stream_wait.assert_called_once()
+        self.assertEqual(stream_wait.call_args.args[0], self.user)
+        self.assertTrue(chunks[0].startswith('retry:'))
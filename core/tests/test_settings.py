@@ -0,0 +1,36 @@
+"""Ответы под ETag версии данных не отдают настройки из устаревшего кэша процесса."""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from core.models import DataVersion, UserSettings
+from core.settings_cache import get_settings_snapshot, local_cache
+
+
+class FreshSettingsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='pw')
+        self.client.force_login(self.user)
+        self.addCleanup(local_cache.clear)
+
+    def change_in_other_process(self, **fields):
+        """Настройки сохранены другим процессом: здесь кэш остался старым, версия данных – новая."""
+        stale = get_settings_snapshot(self.user)
+        UserSettings.objects.filter(user=self.user).update(**fields)
+        DataVersion.bump(self.user)
+        local_cache.set(self.user.pk, stale)
+
+    def test_get_settings_reads_database(self):
+        self.change_in_other_process(dark_theme=True)
+
+        self.assertTrue(self.client.get('/api/settings/').json()['dark_theme'])
+
+    def test_schedule_reads_database(self):
+        # 7 марта 2026 – суббота: выходной по 5/2, рабочий день по 2/2 с этой даты
+        self.change_in_other_process(schedule_type='2/2', first_work_date=date(2026, 3, 7))
+
+        response = self.client.get('/api/schedule/range/', {'from': '2026-03', 'to': '2026-03'})
+
+        self.assertTrue(response.json()['months']['2026-03']['work_schedule']['7'])
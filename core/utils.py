@@ -1,6 +1,41 @@
-from datetime import datetime, timedelta
+import base64
+import json
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone
 from calendar import monthrange
+from functools import lru_cache
+
+from .workcalendar import get_work_calendar
+
+
+def parse_datetime(dt_str):
+    if not dt_str:
+        return None
+    dt_str = dt_str.strip()
+    dt_str = dt_str[:19]
+    for fmt in ('%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M',
+                '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'):
+        try:
+            naive_dt = datetime.strptime(dt_str, fmt)
+            return timezone.make_aware(naive_dt, timezone.get_default_timezone())
+        except ValueError:
+            continue
+    raise ValueError(f'Неверный формат даты/времени: {dt_str}')
+
+
+def normalize_phone(phone):
+    """
+    Приводит телефон к виду 8XXXXXXXXXX.
+    Возвращает None, если в номере не 10 или 11 цифр.
+    """
+    digits = re.sub(r'\D', '', phone)
+    if len(digits) == 10:
+        return '8' + digits
+    if len(digits) == 11 and digits[0] in '78':
+        return '8' + digits[1:]
+    return None
+
 
 def ceil_to_minute(dt):
     """
@@ -13,30 +48,36 @@ def ceil_to_minute(dt):
     return dt + timedelta(minutes=1) - timedelta(seconds=dt.second, microseconds=dt.microsecond)
 
 
-def calculate_next_attempt(attempt_number, intervals_dict):
+def floor_to_minute(dt):
+    """Округляет datetime вниз до целой минуты."""
+    return dt.replace(second=0, microsecond=0)
+
+
+def local_day_bounds(day):
     """
-    Возвращает timedelta для следующей попытки.
-    Поддерживает ключи как int, так и str.
+    Границы дня по местному времени: [начало дня, начало следующего).
+    Фильтр по такому интервалу использует индекс по полю, в отличие от
+    поиска по __date, который оборачивает столбец в функцию.
     """
-    minutes = intervals_dict.get(attempt_number)
-    if minutes is None:
-        minutes = intervals_dict.get(str(attempt_number))
-    if minutes is None:
-        minutes = 20
-    return timedelta(minutes=minutes)
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()), tz)
+    return start, end
 
 
-def calc_time_until(dt):
+def calc_time_until(dt, now=None):
     """
     Возвращает строку с временем до звонка:
     - "Просрочено" если время прошло
     - "Xд Yч" если больше 24 часов
     - "Zч Mм" если меньше 24 часов
     """
-    if dt <= timezone.now():
+    if now is None:
+        now = timezone.now()
+    if dt <= now:
         return "Просрочено"
     
-    delta = dt - timezone.now()
+    delta = dt - now
     days = delta.days
     hours = delta.seconds // 3600
     minutes = (delta.seconds % 3600) // 60
@@ -50,7 +91,7 @@ def calc_time_until(dt):
             return f"{minutes}м"
 
 
-def calc_notification_status(dt):
+def calc_notification_status(dt, now=None):
     """
     Возвращает статус уведомления:
     - "Просрочено" если время уже наступило
@@ -58,7 +99,9 @@ def calc_notification_status(dt):
     - "Близко" если до звонка осталось от 5 до 15 минут
     - "Запланиран" во всех остальных случаях
     """
-    delta = dt - timezone.now()
+    if now is None:
+        now = timezone.now()
+    delta = dt - now
     if delta.total_seconds() <= 0:
         return "Просрочено"
     if delta.total_seconds() <= 300:  # 5 минут
@@ -68,33 +111,169 @@ def calc_notification_status(dt):
     return "Запланиран"
 
 
+class BatchSerializer:
+    """
+    Сериализатор пачки звонков, заявок и уведомлений для ответов API.
+
+    Все строки пачки считаются относительно одного снимка времени now,
+    поэтому «время до звонка» и статус в одном ответе согласованы.
+    Время выводится с точностью до минуты, поэтому перевод в местное время
+    и strftime кэшируются по минуте: в очереди звонков многие строки
+    приходятся на одну минуту, и для них работа выполняется один раз.
+    """
+
+    MINUTE_FORMAT = '%Y-%m-%d %H:%M'
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self._local = {}
+        self._countdown = {}
+
+    def local(self, dt, fmt=MINUTE_FORMAT):
+        """Местное время dt в формате fmt (с точностью до минуты)."""
+        key = (dt.replace(second=0, microsecond=0), fmt)
+        value = self._local.get(key)
+        if value is None:
+            value = self._local[key] = timezone.localtime(dt).strftime(fmt)
+        return value
+
+    def countdown(self, dt):
+        """(время до звонка, статус уведомления) для целой минуты dt."""
+        value = self._countdown.get(dt)
+        if value is None:
+            value = self._countdown[dt] = (
+                calc_time_until(dt, self.now),
+                calc_notification_status(dt, self.now),
+            )
+        return value
+
+    def call(self, row):
+        rounded_next = ceil_to_minute(row['next_attempt'])
+        time_until, status = self.countdown(rounded_next)
+        return {
+            'id': row['id'],
+            'comment': row['comment'],
+            'phone': row['phone'],
+            'first_attempt': self.local(row['first_attempt']),
+            'next_attempt': self.local(rounded_next),
+            'attempt_number': row['attempt_number'],
+            'time_until': time_until,
+            'notification_status': status,
+            'call_type': row['call_type'],
+        }
+
+    def tracking(self, row):
+        return {
+            'tracking_id': row['id'],
+            'claim': row['claim'],
+            'phone': row['phone'],
+            'crm': row['crm'],
+            'connection_datetime': self.local(row['connection_datetime']),
+            'call_record_id': row['call_record_id'],
+            'status': row['status'],
+            'completed': row['completed'],
+        }
+
+    def notification(self, call_id, comment, phone, next_attempt, call_type):
+        return {
+            'id': call_id,
+            'comment': comment,
+            'phone': phone,
+            'next_attempt': self.local(ceil_to_minute(next_attempt), '%H:%M'),
+            'call_type': call_type,
+        }
+
+    def calls(self, rows):
+        return [self.call(row) for row in rows]
+
+    def tracking_list(self, rows):
+        return [self.tracking(row) for row in rows]
+
+    def notifications(self, rows):
+        """rows – кортежи (id, comment, phone, next_attempt, call_type)."""
+        return [self.notification(*row) for row in rows]
+
+
+def encode_cursor(next_attempt, record_id):
+    """Кодирует позицию (next_attempt, id) для постраничной выдачи по ключу."""
+    raw = f"{next_attempt.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Обратная операция к encode_cursor.
+    Возвращает кортеж (next_attempt, id) или бросает ValueError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        dt_str, record_id = raw.split('|')
+        return datetime.fromisoformat(dt_str), int(record_id)
+    except (ValueError, UnicodeError):
+        raise ValueError(f'Неверный курсор: {cursor}')
+
+
+def make_sync_cursor(dt):
+    """Курсор дельта-синхронизации: время в микросекундах от эпохи."""
+    return str(int(dt.timestamp() * 1_000_000))
+
+
+def parse_sync_cursor(cursor):
+    """Обратная операция к make_sync_cursor; бросает ValueError."""
+    try:
+        micros = int(cursor)
+        return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(f'Неверный курсор синхронизации: {cursor}')
+
+
+def format_sse(event, data):
+    """
+    Форматирует одно событие Server-Sent Events.
+    data сериализуется в JSON и передаётся одной строкой.
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
 def generate_work_schedule(year, month, schedule_type, first_work_date=None):
     """
     Генерирует словарь {день: рабочий_ли} для календаря.
     Для графика 2/2 используется непрерывный цикл от first_work_date.
+    Дни берутся из общего рабочего календаря (core/workcalendar.py), а
+    готовые месяцы запоминаются по (тип графика, первый рабочий день, месяц).
     """
-    days_in_month = monthrange(year, month)[1]
-    schedule = {}
+    if isinstance(first_work_date, str):
+        first_work_date = datetime.strptime(first_work_date, '%Y-%m-%d').date()
+    days = _month_work_days(schedule_type, first_work_date, year, month)
+    return {d: is_working for d, is_working in enumerate(days, start=1)}
 
-    if schedule_type == '5/2':
-        for d in range(1, days_in_month + 1):
-            dt = datetime(year, month, d)
-            schedule[d] = dt.weekday() < 5
 
-    elif schedule_type == '2/2':
-        if not first_work_date:
-            first_work_date = datetime(year, month, 1).date()
-        else:
-            if isinstance(first_work_date, str):
-                first_work_date = datetime.strptime(first_work_date, '%Y-%m-%d').date()
+@lru_cache(maxsize=1024)
+def _month_work_days(schedule_type, first_work_date, year, month):
+    month_start = datetime(year, month, 1).date()
+    calendar = get_work_calendar(schedule_type, first_work_date, month_start)
+    days_in_month = monthrange(year, month)[1]
+    return tuple(
+        calendar.is_working(month_start + timedelta(days=d)) for d in range(days_in_month)
+    )
+
 
-        for d in range(1, days_in_month + 1):
-            current_date = datetime(year, month, d).date()
-            diff = (current_date - first_work_date).days
-            schedule[d] = (diff % 4) in (0, 1)
+def parse_month_or_date(value):
+    """'ГГГГ-ММ-ДД' или 'ГГГГ-ММ' (первое число месяца) -> date."""
+    for fmt in ('%Y-%m-%d', '%Y-%m'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Неверный формат даты: {value}')
 
-    else:  # индивидуальный – все дни рабочие
-        for d in range(1, days_in_month + 1):
-            schedule[d] = True
 
-    return schedule
\ No newline at end of file
+def month_range(date_from, date_to):
+    """Месяцы (год, месяц) от месяца date_from до месяца date_to включительно."""
+    year, month = date_from.year, date_from.month
+    months = []
+    while (year, month) <= (date_to.year, date_to.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
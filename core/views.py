@@ -1,11 +1,21 @@
+import hashlib
 import json
-import re
+import time
+from calendar import monthrange
 from datetime import datetime, timedelta
-
+from functools import wraps
+
+from django.conf import settings as django_settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Func, IntegerField, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseBadRequest
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_POST, etag
+from django.utils.cache import patch_cache_control
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.admin.views.decorators import staff_member_required
@@ -13,28 +23,28 @@ from django.contrib.admin.views.decorators import staff_member_required
 from .models import *
 from .forms import *
 from .utils import *
+from .scheduler import notify_scheduler
+from .settings_cache import get_settings_snapshot
+from .retry import DEFAULT_BACKOFF_CAP, DEFAULT_INTERVALS, TAIL_REPEAT
+from .workcalendar import shift_to_work_time
+from .importer import import_calls, iter_rows
+from .callstats import CallStatDelta
+from .callevents import from_epoch_ms, log_call_events
+from .db import read_connection
+from . import exporter, helpsearch
+from .helppage import render_help_accordion
 
 
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
 
-def get_user_settings(user):
-    settings, created = UserSettings.objects.get_or_create(user=user)
-    return settings
-
-
-def parse_datetime(dt_str):
-    if not dt_str:
-        return None
-    dt_str = dt_str.strip()
-    dt_str = dt_str[:19]
-    for fmt in ('%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M',
-                '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'):
-        try:
-            naive_dt = datetime.strptime(dt_str, fmt)
-            return timezone.make_aware(naive_dt, timezone.get_default_timezone())
-        except ValueError:
-            continue
-    raise ValueError(f'Неверный формат даты/времени: {dt_str}')
+def get_user_settings(user, fresh=False):
+    """
+    Разобранные настройки пользователя только для чтения – из кэша, без
+    запроса к БД. Для изменения настроек берётся сама модель UserSettings.
+    Ответы под ETag версии данных берут fresh=True: кэш другого процесса
+    может быть ещё старым, а ETag уже новым.
+    """
+    return get_settings_snapshot(user, fresh)
 
 
 def ceil_to_minute(dt):
@@ -43,6 +53,93 @@ def ceil_to_minute(dt):
     return dt + timedelta(minutes=1) - timedelta(seconds=dt.second, microseconds=dt.microsecond)
 
 
+# ========== ВЕРСИЯ ДАННЫХ И ETAG ==========
+
+def bumps_data_version(view):
+    """Увеличивает версию данных пользователя после успешного изменения."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code < 400:
+            DataVersion.bump(request.user)
+        return response
+    return wrapper
+
+
+def data_version_etag(request, version, time_dependent=False):
+    parts = [str(request.user.pk), str(version), request.get_full_path()]
+    if time_dependent:
+        parts.append(timezone.now().strftime('%Y%m%d%H%M'))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def conditional_on_data_version(time_dependent=False):
+    """
+    ETag из версии данных пользователя и адреса запроса; на совпадающий
+    If-None-Match отвечает 304 без обращения к таблицам записей.
+    time_dependent – в ответе есть поля, зависящие от текущего времени
+    (например, «время до звонка»), поэтому ETag меняется каждую минуту.
+    """
+    def etag_func(request, *args, **kwargs):
+        return data_version_etag(request, DataVersion.current(request.user), time_dependent)
+
+    def decorator(view):
+        conditional_view = etag(etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Браузер хранит ответ, но каждый раз перепроверяет его по ETag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# ========== ДЕЛЬТА-СИНХРОНИЗАЦИЯ ==========
+
+# Запас для курсора: запись могла получить updated_at чуть раньше курсора,
+# а зафиксироваться уже после чтения. Повторы клиент сливает без вреда.
+SYNC_OVERLAP = timedelta(seconds=2)
+# Сколько хранятся «надгробия»; с более старым курсором нужна полная загрузка
+SYNC_TOMBSTONE_RETENTION = timedelta(days=7)
+
+
+def record_deletions(user, kind, record_ids):
+    """Сохраняет «надгробия» удалённых записей и чистит устаревшие."""
+    if not record_ids:
+        return
+    DeletedRecord.objects.bulk_create(
+        [DeletedRecord(user=user, kind=kind, record_id=rid) for rid in record_ids]
+    )
+    DeletedRecord.objects.filter(
+        user=user,
+        kind=kind,
+        deleted_at__lt=timezone.now() - SYNC_TOMBSTONE_RETENTION
+    ).delete()
+
+
+def delta_response(user, kind, queryset, serialize, key, since, now):
+    """
+    Ответ в режиме ?since=<курсор>: только изменённые после курсора строки
+    и id удалённых. Если курсор старше срока хранения «надгробий»,
+    клиенту предлагается полная перезагрузка (reset).
+    serialize – функция, превращающая строки queryset в список словарей.
+    """
+    sync_cursor = make_sync_cursor(now)
+    if since < now - SYNC_TOMBSTONE_RETENTION:
+        return JsonResponse({'reset': True, 'sync_cursor': sync_cursor})
+
+    threshold = since - SYNC_OVERLAP
+    changed = serialize(queryset.filter(updated_at__gte=threshold))
+    deleted = list(DeletedRecord.objects.filter(
+        user=user,
+        kind=kind,
+        deleted_at__gte=threshold
+    ).values_list('record_id', flat=True))
+    return JsonResponse({key: changed, 'deleted': deleted, 'sync_cursor': sync_cursor, 'delta': True})
+
+
 # ========== ГЛАВНАЯ СТРАНИЦА ==========
 
 @login_required
@@ -79,33 +176,222 @@ def tab_tracking(request):
 
 # ========== ЗАПИСИ ЗВОНКОВ ==========
 
-@login_required
-def get_calls(request):
+# Поля звонка, которые нужны для ответа /api/calls/
+CALL_FIELDS = ('id', 'comment', 'phone', 'first_attempt', 'next_attempt', 'attempt_number', 'call_type')
+# Максимальный размер страницы
+CALLS_PAGE_MAX = 1000
+# Страницы больше этого размера (и выдача без limit) отдаются потоком
+CALLS_STREAM_THRESHOLD = 200
+# Сколько строк читать из БД и отдавать клиенту за один раз
+CALLS_CHUNK_SIZE = 200
+
+
+class CallStream:
+    """
+    Части JSON-ответа {"calls": [...], "next_cursor": ..., "sync_cursor": ...}.
+    Общая для синхронного и асинхронного генераторов ответа.
+    """
+    HEAD = '{"calls": ['
+
+    def __init__(self, limit, sync_cursor, serializer):
+        self.limit = limit
+        self.sync_cursor = sync_cursor
+        self.serializer = serializer
+        self.count = 0
+        self.last = None
+        self.chunk = []
+
+    def full(self):
+        return self.limit is not None and self.count == self.limit
+
+    def add(self, row):
+        """Добавляет строку; возвращает готовую часть ответа или ''."""
+        self.chunk.append(json.dumps(self.serializer.call(row), ensure_ascii=False))
+        self.count += 1
+        self.last = row
+        return self._flush() if len(self.chunk) == CALLS_CHUNK_SIZE else ''
+
+    def _flush(self):
+        part = ('' if self.count == len(self.chunk) else ',') + ','.join(self.chunk)
+        self.chunk = []
+        return part
+
+    def tail(self, has_more):
+        next_cursor = encode_cursor(self.last['next_attempt'], self.last['id']) if has_more else None
+        part = self._flush() if self.chunk else ''
+        return part + '], "next_cursor": ' + json.dumps(next_cursor) + ', "sync_cursor": ' + json.dumps(self.sync_cursor) + '}'
+
+
+def stream_calls(rows, limit, sync_cursor, serializer):
+    """
+    Генератор JSON-ответа со звонками по частям.
+    Из rows читается не больше limit + 1 строки: лишняя строка лишь
+    сообщает, что есть следующая страница.
+    """
+    stream = CallStream(limit, sync_cursor, serializer)
+    yield CallStream.HEAD
+    has_more = False
+    for row in rows:
+        if stream.full():
+            has_more = True
+            break
+        part = stream.add(row)
+        if part:
+            yield part
+    yield stream.tail(has_more)
+
+
+def parse_calls_query(request):
+    """
+    Разбирает параметры get_calls. Возвращает (звонки пользователя,
+    since, limit); бросает ValueError с текстом для ответа 400.
+    """
+    calls = CallRecord.objects.filter(user=request.user).order_by('next_attempt', 'id')
+
+    since = request.GET.get('since')
+    if since:
+        return calls, parse_sync_cursor(since), None
+
     filter_date = request.GET.get('date', '')
-    calls = CallRecord.objects.filter(user=request.user)
     if filter_date:
-        calls = calls.filter(next_attempt__date=filter_date)
-    data = []
-    for c in calls:
-        rounded_next = ceil_to_minute(c.next_attempt)
-        first_local = timezone.localtime(c.first_attempt)
-        next_local = timezone.localtime(rounded_next)
-        data.append({
-            'id': c.id,
-            'comment': c.comment,
-            'phone': c.phone,
-            'first_attempt': first_local.strftime('%Y-%m-%d %H:%M'),
-            'next_attempt': next_local.strftime('%Y-%m-%d %H:%M'),
-            'attempt_number': c.attempt_number,
-            'time_until': calc_time_until(rounded_next),
-            'notification_status': calc_notification_status(rounded_next),
-            'call_type': c.call_type,
-        })
-    return JsonResponse({'calls': data})
+        try:
+            day_start, day_end = local_day_bounds(datetime.strptime(filter_date, '%Y-%m-%d').date())
+        except ValueError:
+            raise ValueError('Неверный формат даты')
+        calls = calls.filter(next_attempt__gte=day_start, next_attempt__lt=day_end)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        after_next, after_id = decode_cursor(cursor)
+        calls = calls.filter(
+            Q(next_attempt__gt=after_next) | Q(next_attempt=after_next, id__gt=after_id)
+        )
+
+    limit = request.GET.get('limit')
+    if limit:
+        try:
+            limit = min(max(int(limit), 1), CALLS_PAGE_MAX)
+        except ValueError:
+            raise ValueError('Неверное значение limit')
+    else:
+        limit = None
+    return calls, None, limit
+
+
+def calls_page_response(rows, limit, now, serializer):
+    """Короткая страница (limit не больше CALLS_STREAM_THRESHOLD) одним JSON."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['next_attempt'], rows[-1]['id'])
+    return JsonResponse({
+        'calls': serializer.calls(rows),
+        'next_cursor': next_cursor,
+        'sync_cursor': make_sync_cursor(now),
+    })
+
+
+@login_required
+@read_connection
+@conditional_on_data_version(time_dependent=True)
+def get_calls(request):
+    """
+    Список звонков пользователя, упорядоченный по (next_attempt, id).
+
+    Параметры: date – фильтр по дню; limit и cursor – постраничная выдача
+    по ключу (next_attempt, id), курсор следующей страницы приходит в
+    next_cursor. Без limit возвращается весь список. Из БД читаются только
+    нужные столбцы, а большие ответы отдаются потоком, поэтому память не
+    растёт с размером очереди.
+
+    since – курсор синхронизации (sync_cursor из прошлого ответа): вернутся
+    только изменённые после него звонки и id удалённых, без учёта date.
+    """
+    now = timezone.now()
+    serializer = BatchSerializer(now)
+    try:
+        calls, since, limit = parse_calls_query(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    if since:
+        return delta_response(
+            request.user, 'call', calls.values(*CALL_FIELDS), serializer.calls, 'calls', since, now
+        )
+
+    rows = calls.values(*CALL_FIELDS)
+    if limit is not None:
+        rows = rows[:limit + 1]
+
+    if limit is not None and limit <= CALLS_STREAM_THRESHOLD:
+        return calls_page_response(list(rows), limit, now, serializer)
+
+    return StreamingHttpResponse(
+        stream_calls(rows.iterator(chunk_size=CALLS_CHUNK_SIZE), limit, make_sync_cursor(now), serializer),
+        content_type='application/json'
+    )
+
+
+@login_required
+@conditional_on_data_version()
+def get_call_dates(request):
+    """
+    Дни (по местному времени), на которые назначены звонки, и число звонков
+    в каждом – для фильтра по дате. Один группирующий запрос по индексу
+    (user, next_attempt), без выгрузки самих звонков.
+    """
+    rows = (
+        CallRecord.objects.filter(user=request.user)
+        .annotate(day=TruncDate('next_attempt', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by('-day')
+    )
+    return JsonResponse({
+        'dates': [{'date': row['day'].isoformat(), 'count': row['count']} for row in rows]
+    })
+
+
+CALL_EVENTS_LIMIT = 500
+
+
+@login_required
+def get_call_events(request):
+    """
+    История звонков из журнала CallEvent, новые сначала.
+    Параметры: call – id звонка (в том числе уже удалённого); без него –
+    последние CALL_EVENTS_LIMIT событий оператора. Руководитель может
+    указать user – логин оператора.
+    """
+    user = request.user
+    if request.GET.get('user') and user.is_staff:
+        user = get_object_or_404(User, username=request.GET['user'])
+    events = CallEvent.objects.filter(user=user)
+    if request.GET.get('call'):
+        try:
+            events = events.filter(call_id=int(request.GET['call']))
+        except ValueError:
+            return HttpResponseBadRequest('Неверный id звонка')
+    labels = dict(CallEvent.CODES)
+    rows = events.order_by('-at', '-id').values_list(
+        'call_id', 'code', 'attempt', 'call_type', 'at'
+    )[:CALL_EVENTS_LIMIT]
+    return JsonResponse({'events': [
+        {
+            'call_id': call_id,
+            'code': code,
+            'event': labels.get(code, ''),
+            'attempt': attempt,
+            'call_type': CallEvent.CALL_TYPE_NAMES.get(call_type),
+            'at': timezone.localtime(from_epoch_ms(at)).isoformat(),
+        }
+        for call_id, code, attempt, call_type, at in rows
+    ]})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def add_call(request):
     user = request.user
     settings = get_user_settings(user)
@@ -121,9 +407,8 @@ def add_call(request):
     now = timezone.now()
 
     if call_type == 'Недозвон' or not next_attempt_str:
-        intervals = settings.get_intervals_dict()
-        delta = calculate_next_attempt(1, intervals)
-        next_attempt = ceil_to_minute(now + delta)
+        # Первый шаг политики задан всегда, поэтому время не бывает None
+        next_attempt = shift_to_work_time(settings, settings.retry_policy.next_attempt(1, now))
     else:
         try:
             next_attempt = parse_datetime(next_attempt_str)
@@ -131,35 +416,108 @@ def add_call(request):
         except ValueError as e:
             return HttpResponseBadRequest(str(e))
 
-    call = CallRecord.objects.create(
-        user=user,
-        comment=comment,
-        phone=phone,
-        first_attempt=now,
-        next_attempt=next_attempt,
-        attempt_number=1,
-        call_type=call_type
-    )
+    with transaction.atomic():
+        call = CallRecord.objects.create(
+            user=user,
+            comment=comment,
+            phone=phone,
+            first_attempt=now,
+            next_attempt=next_attempt,
+            attempt_number=1,
+            call_type=call_type
+        )
+        stats = CallStatDelta()
+        stats.added([call.call_type])
+        stats.save(user, now)
+        log_call_events(user, [call], CallEvent.ADDED, now)
+    notify_scheduler(call.id)
     return JsonResponse({'status': 'ok', 'id': call.id})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def update_call_time(request):
     call_id = request.POST.get('id')
     call = get_object_or_404(CallRecord, id=call_id, user=request.user)
     settings = get_user_settings(request.user)
-    new_attempt = call.attempt_number + 1
-    delta = calculate_next_attempt(new_attempt, settings.get_intervals_dict())
-    call.next_attempt = ceil_to_minute(timezone.now() + delta)
-    call.attempt_number = new_attempt
-    call.call_type = 'Перезвон'
-    call.save()
+    now = timezone.now()
+    mark_no_answer([call], settings, now)
+    with transaction.atomic():
+        call.save()
+        stats = CallStatDelta()
+        stats.attempts([call])
+        stats.save(request.user, now)
+        log_no_answer_events(request.user, [call], now)
+    notify_scheduler(call.id)
     return JsonResponse({'status': 'ok'})
 
 
+# Поля, которые меняет отметка «недозвон»
+NO_ANSWER_FIELDS = ['next_attempt', 'attempt_number', 'call_type', 'notified_at', 'updated_at']
+
+
+def mark_no_answer(calls, settings, now):
+    """
+    Переводит звонки на следующую попытку по политике попыток из настроек
+    (без сохранения в БД), при необходимости – на рабочее время. Если
+    попытки исчерпаны, время звонка не меняется, а notified_at
+    выставляется, чтобы звонок больше не напоминал о себе.
+    """
+    next_attempts = settings.retry_policy.schedule([call.attempt_number + 1 for call in calls], now)
+    shifted = {}
+    for call, next_attempt in zip(calls, next_attempts):
+        if next_attempt not in shifted:
+            shifted[next_attempt] = shift_to_work_time(settings, next_attempt)
+        next_attempt = shifted[next_attempt]
+        call.attempt_number += 1
+        if next_attempt is None:
+            call.call_type = 'Исчерпан'
+            call.notified_at = now
+        else:
+            call.next_attempt = next_attempt
+            call.call_type = 'Перезвон'
+            call.notified_at = None
+        call.updated_at = now
+
+
+def log_no_answer_events(user, calls, now):
+    """События «недозвон»; для звонков с исчерпанными попытками – EXHAUSTED."""
+    retried = [call for call in calls if call.call_type != 'Исчерпан']
+    exhausted = [call for call in calls if call.call_type == 'Исчерпан']
+    log_call_events(user, retried, CallEvent.NO_ANSWER, now)
+    log_call_events(user, exhausted, CallEvent.EXHAUSTED, now)
+
+
 @login_required
 @require_POST
+@bumps_data_version
+def update_call_time_batch(request):
+    """
+    «Недозвон» для нескольких звонков за один запрос: одни настройки,
+    одно «сейчас» и одно групповое обновление в транзакции.
+    """
+    ids = request.POST.getlist('ids[]')
+    if not ids:
+        return HttpResponseBadRequest('Не выбраны записи')
+    # Все поля, которые пишет bulk_update: отложенное поле дочитывалось бы по запросу на звонок
+    calls = list(CallRecord.objects.filter(id__in=ids, user=request.user).only('id', *NO_ANSWER_FIELDS))
+    settings = get_user_settings(request.user)
+    now = timezone.now()
+    mark_no_answer(calls, settings, now)
+    with transaction.atomic():
+        CallRecord.objects.bulk_update(calls, NO_ANSWER_FIELDS, batch_size=500)
+        stats = CallStatDelta()
+        stats.attempts(calls)
+        stats.save(request.user, now)
+        log_no_answer_events(request.user, calls, now)
+    notify_scheduler(*[call.id for call in calls])
+    return JsonResponse({'status': 'ok', 'updated': len(calls)})
+
+
+@login_required
+@require_POST
+@bumps_data_version
 def adjust_call_time(request):
     call_id = request.POST.get('id')
     new_time_str = request.POST.get('next_attempt')
@@ -170,64 +528,139 @@ def adjust_call_time(request):
     except ValueError as e:
         return HttpResponseBadRequest(str(e))
     call.next_attempt = next_attempt
+    call.notified_at = None
     call.save()
+    log_call_events(request.user, [call], CallEvent.ADJUSTED)
+    notify_scheduler(call.id)
     return JsonResponse({'status': 'ok'})
 
 
+# Сколько id звонков в одном DELETE: меньше лимита параметров старых сборок SQLite (999)
+DELETE_CHUNK_SIZE = 900
+
+
+def delete_records(user, calls, tracking):
+    """
+    Удаляет звонки и заявки множествами, без обхода по строкам, и сохраняет
+    их «надгробия». calls и tracking должны уже включать связанные записи.
+    Вызывается внутри транзакции. Возвращает (звонков, заявок) удалено.
+
+    Каждая таблица меняется одним запросом (звонки – одним на
+    DELETE_CHUNK_SIZE штук). Обычный calls.delete() так не умеет: на
+    CallRecord ссылаются DueCallEvent и TrackingRecord, поэтому сборщик
+    Django читает удаляемые звонки и удаляет их пачками по 100. Связанные
+    строки здесь убираются явно, а сами звонки – обычным DELETE по id.
+    """
+    deleted_calls = list(calls.only('id', 'attempt_number', 'call_type'))
+    call_ids = [call.id for call in deleted_calls]
+    tracking_ids = list(tracking.values_list('id', flat=True))
+    stats = CallStatDelta()
+    stats.deleted(calls)
+    tracking.delete()
+    # Заявки вне tracking, если такие есть, теряют звонок (on_delete=SET_NULL)
+    TrackingRecord.objects.filter(call_record__in=calls).update(call_record=None)
+    DueCallEvent.objects.filter(call__in=calls).delete()
+    # Ссылок на звонки больше нет, сигналов на удаление у CallRecord нет –
+    # сборщик не нужен, достаточно DELETE по id
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for i in range(0, len(call_ids), DELETE_CHUNK_SIZE):
+            chunk = call_ids[i:i + DELETE_CHUNK_SIZE]
+            cursor.execute(
+                f'DELETE FROM {qn(CallRecord._meta.db_table)} WHERE {qn(CallRecord._meta.pk.column)} '
+                f'IN ({", ".join(["%s"] * len(chunk))})',
+                chunk
+            )
+    record_deletions(user, 'call', call_ids)
+    record_deletions(user, 'tracking', tracking_ids)
+    stats.save(user)
+    log_call_events(user, deleted_calls, CallEvent.DELETED)
+    return len(call_ids), len(tracking_ids)
+
+
+def deletion_response(deleted_calls, deleted_tracking, **extra):
+    return JsonResponse({
+        'status': 'ok',
+        'deleted_calls': deleted_calls,
+        'deleted_tracking': deleted_tracking,
+        **extra
+    })
+
+
 @login_required
 @require_POST
+@bumps_data_version
 def delete_calls(request):
+    """Удалить выбранные звонки вместе с их заявками."""
     ids = request.POST.getlist('ids[]')
-    calls = CallRecord.objects.filter(id__in=ids, user=request.user)
-    for call in calls:
-        try:
-            tracking = TrackingRecord.objects.get(call_record=call)
-            tracking.delete()  # удаляем заявку вместе со звонком
-        except TrackingRecord.DoesNotExist:
-            pass
-    calls.delete()
-    return JsonResponse({'status': 'ok'})
+    with transaction.atomic():
+        call_ids = list(
+            CallRecord.objects.filter(id__in=ids, user=request.user).values_list('id', flat=True)
+        )
+        deleted = delete_records(
+            request.user,
+            CallRecord.objects.filter(id__in=call_ids),
+            TrackingRecord.objects.filter(call_record_id__in=call_ids)
+        )
+    return deletion_response(*deleted)
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def postpone_call(request):
     call_id = request.POST.get('id')
     call = get_object_or_404(CallRecord, id=call_id, user=request.user)
     call.next_attempt = ceil_to_minute(call.next_attempt + timedelta(minutes=10))
-    call.save(update_fields=['next_attempt'])
+    call.notified_at = None
+    call.save(update_fields=['next_attempt', 'notified_at', 'updated_at'])
+    log_call_events(request.user, [call], CallEvent.POSTPONED)
+    notify_scheduler(call.id)
     return JsonResponse({'status': 'ok'})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def complete_call(request):
     """Отметить звонок как успешный: удалить звонок, пометить заявку выполненной."""
     call_id = request.POST.get('id')
     call = get_object_or_404(CallRecord, id=call_id, user=request.user)
-    try:
-        tracking = TrackingRecord.objects.get(call_record=call)
-        tracking.completed = True
-        tracking.call_record = None
-        tracking.status = 'Выполнена'
-        tracking.save()
-    except TrackingRecord.DoesNotExist:
-        pass
-    call.delete()
+    with transaction.atomic():
+        try:
+            tracking = TrackingRecord.objects.get(call_record=call)
+            tracking.completed = True
+            tracking.call_record = None
+            tracking.status = 'Выполнена'
+            tracking.save()
+        except TrackingRecord.DoesNotExist:
+            pass
+        record_deletions(request.user, 'call', [call.id])
+        stats = CallStatDelta()
+        stats.completed(call)
+        stats.save(request.user)
+        log_call_events(request.user, [call], CallEvent.COMPLETED)
+        call.delete()
     return JsonResponse({'status': 'ok'})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def clear_all_records(request):
     user = request.user
-    CallRecord.objects.filter(user=user).delete()
-    TrackingRecord.objects.filter(user=user).delete()
-    return JsonResponse({'status': 'ok', 'message': 'Все записи очищены'})
+    with transaction.atomic():
+        deleted = delete_records(
+            user,
+            CallRecord.objects.filter(user=user),
+            TrackingRecord.objects.filter(user=user)
+        )
+    return deletion_response(*deleted, message='Все записи очищены')
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def update_call_comment(request):
     call_id = request.POST.get('id')
     comment = request.POST.get('comment')
@@ -235,57 +668,76 @@ def update_call_comment(request):
         return HttpResponseBadRequest('Комментарий не может быть пустым')
     call = get_object_or_404(CallRecord, id=call_id, user=request.user)
     call.comment = comment
-    call.save(update_fields=['comment'])
+    call.save(update_fields=['comment', 'updated_at'])
     return JsonResponse({'status': 'ok'})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def update_call_phone(request):
     call_id = request.POST.get('id')
     phone = request.POST.get('phone')
     if not phone:
         return HttpResponseBadRequest('Телефон не может быть пустым')
 
-    digits = re.sub(r'\D', '', phone)
-    if len(digits) == 10:
-        digits = '8' + digits
-    elif len(digits) == 11 and digits[0] == '7':
-        digits = '8' + digits[1:]
-    elif len(digits) == 11 and digits[0] == '8':
-        digits = digits
-    else:
+    digits = normalize_phone(phone)
+    if digits is None:
         return HttpResponseBadRequest('Неверный формат телефона (должно быть 10 или 11 цифр)')
 
     call = get_object_or_404(CallRecord, id=call_id, user=request.user)
     call.phone = digits
-    call.save(update_fields=['phone'])
+    call.save(update_fields=['phone', 'updated_at'])
     return JsonResponse({'status': 'ok'})
 
 
+@login_required
+@require_POST
+def import_calls_file(request):
+    """
+    Импорт звонков из CSV/XLSX (поле file). Файл читается потоком и пишется
+    пачками; в ответе – число созданных записей и ошибки по строкам.
+    Версию данных увеличивает сам import_calls.
+    """
+    upload = request.FILES.get('file')
+    if not upload:
+        return HttpResponseBadRequest('Файл не выбран')
+    try:
+        result = import_calls(request.user, iter_rows(upload.file, upload.name))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse({'status': 'ok', **result.as_dict()})
+
+
 # ========== ОТСЛЕЖИВАНИЕ ЗАЯВОК ==========
 
+TRACKING_FIELDS = ('id', 'claim', 'phone', 'crm', 'connection_datetime', 'call_record_id', 'status', 'completed')
+
+
 @login_required
+@read_connection
+@conditional_on_data_version()
 def get_tracking(request):
-    tracking = TrackingRecord.objects.filter(user=request.user)
-    data = []
-    for t in tracking:
-        conn_local = timezone.localtime(t.connection_datetime)
-        data.append({
-            'tracking_id': t.id,
-            'claim': t.claim,
-            'phone': t.phone,
-            'crm': t.crm,
-            'connection_datetime': conn_local.strftime('%Y-%m-%d %H:%M'),
-            'call_record_id': t.call_record_id if t.call_record else None,
-            'status': t.status,
-            'completed': t.completed,
-        })
-    return JsonResponse({'tracking': data})
+    """Список заявок; since – дельта-синхронизация, как в get_calls."""
+    now = timezone.now()
+    serializer = BatchSerializer(now)
+    tracking = TrackingRecord.objects.filter(user=request.user).order_by('id').values(*TRACKING_FIELDS)
+
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = parse_sync_cursor(since)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        return delta_response(request.user, 'tracking', tracking, serializer.tracking_list, 'tracking', since, now)
+
+    data = serializer.tracking_list(tracking)
+    return JsonResponse({'tracking': data, 'sync_cursor': make_sync_cursor(now)})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def add_tracking(request):
     user = request.user
 
@@ -302,76 +754,122 @@ def add_tracking(request):
     except ValueError as e:
         return HttpResponseBadRequest(str(e))
 
-    tracking = TrackingRecord.objects.create(
-        user=user,
-        claim=claim,
-        phone=phone,
-        crm=crm,
-        connection_datetime=connection_dt,
-        status='Активна',
-        completed=False
-    )
-
     next_time = ceil_to_minute(connection_dt + timedelta(hours=1))
 
-    call = CallRecord.objects.create(
-        user=user,
-        comment=f"Заявка: {claim}",
-        phone=phone,  # ✅ теперь используем телефон из заявки
-        first_attempt=timezone.now(),
-        next_attempt=next_time,
-        attempt_number=1,
-        call_type='Отслеживание'
-    )
-
-    tracking.call_record = call
-    tracking.save()
+    with transaction.atomic():
+        tracking = TrackingRecord.objects.create(
+            user=user,
+            claim=claim,
+            phone=phone,
+            crm=crm,
+            connection_datetime=connection_dt,
+            status='Активна',
+            completed=False
+        )
+
+        call = CallRecord.objects.create(
+            user=user,
+            comment=f"Заявка: {claim}",
+            phone=phone,  # ✅ теперь используем телефон из заявки
+            first_attempt=timezone.now(),
+            next_attempt=next_time,
+            attempt_number=1,
+            call_type='Отслеживание'
+        )
+
+        tracking.call_record = call
+        tracking.save()
+        stats = CallStatDelta()
+        stats.added([call.call_type])
+        stats.save(user)
+        log_call_events(user, [call], CallEvent.ADDED)
+    notify_scheduler(call.id)
 
     return JsonResponse({'status': 'ok', 'tracking_id': tracking.id, 'call_id': call.id})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def delete_tracking(request):
+    """Удалить выбранные заявки вместе с их звонками."""
     ids = request.POST.getlist('ids[]')
-    for tid in ids:
-        tracking = get_object_or_404(TrackingRecord, id=tid, user=request.user)
-        if tracking.call_record:
-            tracking.call_record.delete()
-        tracking.delete()
-    return JsonResponse({'status': 'ok'})
+    with transaction.atomic():
+        rows = list(
+            TrackingRecord.objects.filter(id__in=ids, user=request.user).values_list('id', 'call_record_id')
+        )
+        deleted = delete_records(
+            request.user,
+            CallRecord.objects.filter(id__in=[call_id for _, call_id in rows if call_id]),
+            TrackingRecord.objects.filter(id__in=[tracking_id for tracking_id, _ in rows])
+        )
+    return deletion_response(*deleted)
 
 
 # ========== КАЛЕНДАРЬ И ЗАДАЧИ ==========
 
+# Сколько месяцев календаря можно запросить за раз
+SCHEDULE_RANGE_MAX_MONTHS = 12
+
+
+def schedule_months(user, months):
+    """
+    График работы и задачи на месяцы months [(год, месяц), ...]:
+    {'ГГГГ-ММ': {'work_schedule': {...}, 'tasks': {день: [...]}}}.
+    Задачи всех месяцев читаются одним запросом по индексу (user, date).
+    """
+    settings = get_user_settings(user, fresh=True)
+    data = {}
+    for year, month in months:
+        data[f'{year:04d}-{month:02d}'] = {
+            'work_schedule': generate_work_schedule(year, month, settings.schedule_type, settings.first_work_date),
+            'tasks': {},
+        }
+
+    first_year, first_month = months[0]
+    last_year, last_month = months[-1]
+    range_start = datetime(first_year, first_month, 1).date()
+    range_end = datetime(last_year, last_month, monthrange(last_year, last_month)[1]).date()
+    tasks = DailyTask.objects.filter(
+        user=user, date__gte=range_start, date__lte=range_end
+    ).values_list('id', 'date', 'task', 'completed')
+    for task_id, day, task, completed in tasks:
+        tasks_by_day = data[f'{day.year:04d}-{day.month:02d}']['tasks']
+        tasks_by_day.setdefault(day.day, []).append({'id': task_id, 'task': task, 'completed': completed})
+    return data
+
+
 @login_required
+@conditional_on_data_version(time_dependent=True)
 def get_schedule_data(request):
     year = int(request.GET.get('year', timezone.now().year))
     month = int(request.GET.get('month', timezone.now().month))
-    settings = get_user_settings(request.user)
+    return JsonResponse(schedule_months(request.user, [(year, month)])[f'{year:04d}-{month:02d}'])
 
-    work_schedule = generate_work_schedule(
-        year, month,
-        settings.schedule_type,
-        settings.first_work_date
-    )
 
-    tasks = DailyTask.objects.filter(user=request.user, date__year=year, date__month=month)
-    tasks_by_day = {}
-    for t in tasks:
-        day = t.date.day
-        if day not in tasks_by_day:
-            tasks_by_day[day] = []
-        tasks_by_day[day].append({'id': t.id, 'task': t.task, 'completed': t.completed})
-
-    return JsonResponse({
-        'work_schedule': work_schedule,
-        'tasks': tasks_by_day
-    })
+@login_required
+@conditional_on_data_version()
+def get_schedule_range(request):
+    """
+    Календарь за несколько месяцев одним запросом. from и to – даты
+    ГГГГ-ММ-ДД (или ГГГГ-ММ); диапазон расширяется до целых месяцев.
+    """
+    try:
+        date_from = parse_month_or_date(request.GET['from'])
+        date_to = parse_month_or_date(request.GET['to'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Укажите from и to в формате ГГГГ-ММ-ДД')
+    months = month_range(date_from, date_to)
+    if not months:
+        return HttpResponseBadRequest('Дата from позже даты to')
+    if len(months) > SCHEDULE_RANGE_MAX_MONTHS:
+        return HttpResponseBadRequest(f'Не больше {SCHEDULE_RANGE_MAX_MONTHS} месяцев за запрос')
+    return JsonResponse({'months': schedule_months(request.user, months)})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def add_task(request):
     user = request.user
     date_str = request.POST.get('date')
@@ -383,6 +881,7 @@ def add_task(request):
 
 @login_required
 @require_POST
+@bumps_data_version
 def toggle_task(request):
     task_id = request.POST.get('id')
     task = get_object_or_404(DailyTask, id=task_id, user=request.user)
@@ -393,6 +892,7 @@ def toggle_task(request):
 
 @login_required
 @require_POST
+@bumps_data_version
 def delete_task(request):
     task_id = request.POST.get('id')
     DailyTask.objects.filter(id=task_id, user=request.user).delete()
@@ -402,30 +902,85 @@ def delete_task(request):
 # ========== ЗАМЕТКИ ==========
 
 @login_required
+@conditional_on_data_version()
 def get_note(request):
     note, _ = Note.objects.get_or_create(user=request.user)
-    return JsonResponse({'content': note.content})
+    return JsonResponse({'content': note.content, 'version': note.version})
+
+
+def note_conflict(note):
+    """Ответ 409: заметку уже изменили (например, в другой вкладке)."""
+    return JsonResponse({
+        'status': 'conflict',
+        'version': note.version,
+        'content': note.content,
+    }, status=409)
 
 
 @login_required
 @require_POST
 def save_note(request):
-    content = request.POST.get('content', '')
+    """
+    Сохраняет заметку. Принимает либо правку относительно известной версии
+    (base_version, start, end, text – заменить символы [start, end) на
+    text), либо весь текст (content, base_version необязателен).
+    Если base_version не совпадает с текущей версией – 409 с актуальным
+    текстом. Если текст не изменился, запись в БД не выполняется.
+    """
     note, _ = Note.objects.get_or_create(user=request.user)
-    note.content = content
-    note.save()
-    return JsonResponse({'status': 'ok'})
+
+    base_version = request.POST.get('base_version')
+    if base_version is not None:
+        try:
+            base_version = int(base_version)
+        except ValueError:
+            return HttpResponseBadRequest('Неверная версия')
+        if base_version != note.version:
+            return note_conflict(note)
+
+    if 'content' in request.POST:
+        content = request.POST['content']
+    else:
+        if base_version is None:
+            return HttpResponseBadRequest('Для правки нужна base_version')
+        try:
+            start = int(request.POST['start'])
+            end = int(request.POST['end'])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest('Неверная правка')
+        if not 0 <= start <= end <= len(note.content):
+            return HttpResponseBadRequest('Правка за пределами текста')
+        content = note.content[:start] + request.POST.get('text', '') + note.content[end:]
+
+    if content == note.content:
+        return JsonResponse({'status': 'ok', 'version': note.version, 'changed': False})
+
+    # Условный UPDATE: из двух одновременных правок одной версии пройдёт одна
+    updated = Note.objects.filter(pk=note.pk, version=note.version).update(
+        content=content,
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        note.refresh_from_db()
+        return note_conflict(note)
+    DataVersion.bump(request.user)
+    return JsonResponse({'status': 'ok', 'version': note.version + 1, 'changed': True})
 
 
 # ========== НАСТРОЙКИ ==========
 
 @login_required
+@conditional_on_data_version()
 def get_settings(request):
-    settings = get_user_settings(request.user)
+    settings = get_user_settings(request.user, fresh=True)
     return JsonResponse({
         'schedule_type': settings.schedule_type,
         'first_work_date': settings.first_work_date.isoformat() if settings.first_work_date else None,
         'intervals': settings.get_intervals_dict(),
+        'retry_tail': settings.retry_tail,
+        'retry_backoff_cap': settings.retry_backoff_cap,
+        'callbacks_in_work_time': settings.callbacks_in_work_time,
         'sound_enabled': settings.sound_enabled,
         'volume': settings.volume,
         'dark_theme': settings.dark_theme,
@@ -434,9 +989,10 @@ def get_settings(request):
 
 @login_required
 @require_POST
+@bumps_data_version
 def save_settings(request):
     user = request.user
-    settings = get_user_settings(user)
+    settings, _ = UserSettings.objects.get_or_create(user=user)
 
     settings.schedule_type = request.POST.get('schedule_type', settings.schedule_type)
 
@@ -452,70 +1008,292 @@ def save_settings(request):
     settings.sound_enabled = request.POST.get('sound_enabled') == 'true'
     settings.volume = int(request.POST.get('volume', settings.volume))
     settings.dark_theme = request.POST.get('dark_theme') == 'true'
+    settings.callbacks_in_work_time = request.POST.get('callbacks_in_work_time') == 'true'
 
     intervals_json = request.POST.get('intervals')
     if intervals_json:
-        try:
-            intervals = json.loads(intervals_json)
-            settings.intervals = json.dumps(intervals, ensure_ascii=False)
-        except json.JSONDecodeError:
-            return JsonResponse({'status': 'error', 'message': 'Неверный формат интервалов'}, status=400)
+        settings.intervals = intervals_json
+    settings.retry_tail = request.POST.get('retry_tail', settings.retry_tail)
+    try:
+        settings.retry_backoff_cap = int(request.POST.get('retry_backoff_cap', settings.retry_backoff_cap))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Неверный предел удвоения'}, status=400)
 
-    settings.save()
+    # Интервалы и поведение после них проверяются при сохранении модели
+    try:
+        settings.save()
+    except ValidationError as e:
+        return JsonResponse({'status': 'error', 'message': ' '.join(e.messages)}, status=400)
     return JsonResponse({'status': 'ok'})
 
 
 @login_required
 @require_POST
+@bumps_data_version
 def reset_settings(request):
     user = request.user
-    settings = get_user_settings(user)
+    settings, _ = UserSettings.objects.get_or_create(user=user)
     settings.schedule_type = '5/2'
     settings.first_work_date = None
-    settings.intervals = json.dumps({1: 20, 2: 30, 3: 60, 4: 120, 5: 240})
+    settings.intervals = json.dumps(DEFAULT_INTERVALS)
+    settings.retry_tail = TAIL_REPEAT
+    settings.retry_backoff_cap = DEFAULT_BACKOFF_CAP
     settings.sound_enabled = True
     settings.volume = 100
     settings.dark_theme = False
+    settings.callbacks_in_work_time = False
     settings.save()
     return JsonResponse({'status': 'ok'})
 
 
 # ========== УВЕДОМЛЕНИЯ ==========
 
+def collect_due_notifications(user, now):
+    """
+    Возвращает список просроченных звонков, о которых пользователь ещё не
+    уведомлён, и помечает их как уведомлённые.
+
+    Звонок просрочен, если ceil_to_minute(next_attempt) <= now, что равносильно
+    next_attempt <= floor_to_minute(now) – условие целиком проверяется в SQL
+    по индексу (user, notified_at, next_attempt). Захват выполняется одним
+    условным UPDATE: из нескольких одновременных запросов звонок достанется
+    только тому, чья метка notified_at попала в строку. Если ничего не
+    просрочено, запрос ограничивается одним SELECT без блокировки на запись.
+
+    При включённом планировщике очередь звонков не сканируется вовсе:
+    забираются готовые события DueCallEvent.
+    """
+    if django_settings.CALL_SCHEDULER_ENABLED:
+        return collect_scheduled_notifications(user, now)
+
+    due_ids = list(due_calls(user, now))
+    if not due_ids:
+        return []
+    claim_due_calls(due_ids).update(notified_at=now)
+    return BatchSerializer(now).notifications(claimed_calls(due_ids, now))
+
+
+def collect_scheduled_notifications(user, now):
+    """Забирает недоставленные события планировщика тем же условным UPDATE."""
+    event_ids = list(due_events(user))
+    if not event_ids:
+        return []
+    claim_due_events(event_ids).update(delivered_at=now)
+    return BatchSerializer(now).notifications(claimed_events(event_ids, now))
+
+
+# Запросы сбора уведомлений, общие для синхронных и асинхронных представлений
+
+def due_calls(user, now):
+    return CallRecord.objects.filter(
+        user=user,
+        notified_at__isnull=True,
+        next_attempt__lte=floor_to_minute(now)
+    ).values_list('id', flat=True)
+
+
+def claim_due_calls(call_ids):
+    return CallRecord.objects.filter(id__in=call_ids, notified_at__isnull=True)
+
+
+def claimed_calls(call_ids, now):
+    return CallRecord.objects.filter(id__in=call_ids, notified_at=now).values_list(
+        'id', 'comment', 'phone', 'next_attempt', 'call_type'
+    )
+
+
+def due_events(user):
+    return DueCallEvent.objects.filter(user=user, delivered_at__isnull=True).values_list('id', flat=True)
+
+
+def claim_due_events(event_ids):
+    return DueCallEvent.objects.filter(id__in=event_ids, delivered_at__isnull=True)
+
+
+def claimed_events(event_ids, now):
+    return DueCallEvent.objects.filter(id__in=event_ids, delivered_at=now).values_list(
+        'call_id', 'call__comment', 'call__phone', 'call__next_attempt', 'call__call_type'
+    )
+
+
 @login_required
 def get_notifications(request):
-    user = request.user
-    now = timezone.now()
+    """
+    Разовая проверка уведомлений (запасной вариант для браузеров без SSE).
+    Без @read_connection: запрос забирает звонки записью notified_at, и
+    поиск наступивших звонков должен идти в основное подключение.
+    """
+    data = collect_due_notifications(request.user, timezone.now())
+    return JsonResponse({'notifications': data})
+
 
-    calls = CallRecord.objects.filter(
+# Минимальная пауза потока, пока планировщик публикует наступивший звонок
+NOTIFICATION_STREAM_MIN_WAIT = 0.25
+# Самая длинная пауза потока: звонок, добавленный или перенесённый «на
+# сейчас» во время сна, должен прийти не позже чем через секунду. С
+# планировщиком проверка DueCallEvent – один поиск по индексу (user, delivered_at)
+NOTIFICATION_STREAM_MAX_WAIT = 1.0
+
+
+def notification_stream_wait(user, now, deadline):
+    """
+    Сколько потоку уведомлений спать до следующей проверки, секунды; None –
+    время соединения вышло. Без планировщика – до ближайшего неуведомлённого
+    звонка, но не дольше NOTIFICATION_STREAM_MAX_WAIT: звонок, сохранённый во
+    время сна, иначе пришёл бы с опозданием. С планировщиком очередь звонков не читается: наступившие звонки
+    приходят готовыми событиями DueCallEvent, а будущих событий в таблице
+    нет, поэтому поток просто часто проверяет её. Общая для синхронного и
+    асинхронного (async_views) потоков.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return None
+    wait = min(NOTIFICATION_STREAM_MAX_WAIT, django_settings.NOTIFICATION_STREAM_RECHECK, remaining)
+    if django_settings.CALL_SCHEDULER_ENABLED:
+        return wait
+    next_due = CallRecord.objects.filter(
         user=user,
         notified_at__isnull=True
-    )
+    ).aggregate(next_due=Min('next_attempt'))['next_due']
+    if next_due is not None:
+        until_due = (ceil_to_minute(next_due) - now).total_seconds()
+        wait = min(wait, max(until_due, NOTIFICATION_STREAM_MIN_WAIT))
+    return wait
+
+
+def notification_events(user):
+    """
+    Генератор событий SSE для потока уведомлений.
+    Между проверками спит (см. notification_stream_wait), поэтому на
+    пустой очереди запросов к БД почти нет. Через
+    NOTIFICATION_STREAM_TIMEOUT секунд поток завершается, и браузер
+    переподключается сам.
+    """
+    deadline = time.monotonic() + django_settings.NOTIFICATION_STREAM_TIMEOUT
+
+    yield f'retry: {django_settings.NOTIFICATION_STREAM_RETRY_MS}\n\n'
+    while True:
+        now = timezone.now()
+        data = collect_due_notifications(user, now)
+        if data:
+            yield format_sse('notifications', {'notifications': data})
+
+        wait = notification_stream_wait(user, now, deadline)
+        if wait is None:
+            break
+        time.sleep(wait)
+        # Комментарий-пинг: держит прокси открытым и выявляет отключившихся клиентов
+        yield ': ping\n\n'
 
-    data = []
-    for call in calls:
-        rounded_next = ceil_to_minute(call.next_attempt)
-        if rounded_next <= now:
-            next_local = timezone.localtime(rounded_next)
-            data.append({
-                'id': call.id,
-                'comment': call.comment,
-                'phone': call.phone,
-                'next_attempt': next_local.strftime('%H:%M'),
-                'call_type': call.call_type,
-            })
-            call.notified_at = now
-            call.save(update_fields=['notified_at'])
 
-    return JsonResponse({'notifications': data})
+@login_required
+def notifications_stream(request):
+    """
+    Поток уведомлений (Server-Sent Events) вместо опроса каждые 2 секунды.
+    Если поток выключен (NOTIFICATION_STREAM_ENABLED), ответ 204: браузер
+    не переподключается и переходит на опрос.
+    """
+    if not django_settings.NOTIFICATION_STREAM_ENABLED:
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(
+        notification_events(request.user),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # ========== АДМИН-ПАНЕЛЬ (ПОЛЬЗОВАТЕЛИ) ==========
 
+ADMIN_USERS_PER_PAGE = 50
+
+
+def count_subquery(queryset):
+    """
+    Коррелированный подзапрос COUNT(*) для аннотации. В отличие от
+    Count() через JOIN, счётчики по разным таблицам не перемножаются,
+    а считаются только для строк текущей страницы.
+    """
+    counted = queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n')
+    return Subquery(counted, output_field=IntegerField())
+
+
+def annotate_workload(users, now):
+    """
+    Нагрузка операторов одним запросом: активные, просроченные и
+    назначенные на сегодня звонки, активные заявки.
+    """
+    _, today_end = local_day_bounds(timezone.localdate(now))
+    calls = CallRecord.objects.filter(user=OuterRef('pk')).exclude(call_type='Исчерпан')
+    return users.annotate(
+        calls_active=count_subquery(calls),
+        calls_overdue=count_subquery(calls.filter(next_attempt__lt=now)),
+        calls_today=count_subquery(calls.filter(next_attempt__gte=now, next_attempt__lt=today_end)),
+        tracking_active=count_subquery(
+            TrackingRecord.objects.filter(user=OuterRef('pk'), completed=False)
+        ),
+    )
+
+
 @staff_member_required
 def admin_panel(request):
-    users = User.objects.all()
-    return render(request, 'admin_panel.html', {'users': users})
+    """
+    Пользователи с нагрузкой. Параметры: q – поиск по логину и имени,
+    page – номер страницы (по ADMIN_USERS_PER_PAGE).
+    """
+    query = request.GET.get('q', '').strip()
+    users = User.objects.order_by('id')
+    if query:
+        users = users.filter(
+            Q(username__icontains=query) | Q(first_name__icontains=query) | Q(last_name__icontains=query)
+        )
+    page = Paginator(annotate_workload(users, timezone.now()), ADMIN_USERS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'admin_panel.html', {'page': page, 'users': page.object_list, 'query': query})
+
+
+@staff_member_required
+def admin_call_stats(request):
+    """
+    Дневная статистика операторов из счётчиков CallStat.
+    Параметры: from, to – даты ГГГГ-ММ-ДД включительно (по умолчанию
+    последние 30 дней); user – логин оператора (по умолчанию все).
+    """
+    today = timezone.localdate()
+    try:
+        date_from = request.GET.get('from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else today - timedelta(days=29)
+        date_to = request.GET.get('to')
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today
+    except ValueError:
+        return HttpResponseBadRequest('Даты указываются в формате ГГГГ-ММ-ДД')
+
+    stats = CallStat.objects.filter(day__gte=date_from, day__lte=date_to)
+    if request.GET.get('user'):
+        stats = stats.filter(user__username=request.GET['user'])
+    rows = (
+        stats.values('user__username', 'day')
+        .annotate(
+            added=Sum('added'),
+            attempts=Sum('attempts'),
+            completed=Sum('completed'),
+            deleted=Sum('deleted'),
+            success_attempts=Sum('success_attempts'),
+        )
+        .order_by('day', 'user__username')
+    )
+    return JsonResponse({'stats': [
+        {
+            'user': row['user__username'],
+            'day': row['day'].isoformat(),
+            'added': row['added'],
+            'attempts': row['attempts'],
+            'completed': row['completed'],
+            'deleted': row['deleted'],
+            'avg_attempts': round(row['success_attempts'] / row['completed'], 2) if row['completed'] else None,
+        }
+        for row in rows
+    ]})
 
 
 @staff_member_required
@@ -545,12 +1323,52 @@ def admin_delete_user(request):
         return HttpResponseBadRequest('Пользователь не найден')
 
 
+@staff_member_required
+def export_data(request):
+    """
+    Потоковая выгрузка для руководителей.
+    Параметры: kind – calls, tracking или tasks; format – csv или jsonl;
+    user – логин оператора (по умолчанию все); from, to – даты ГГГГ-ММ-ДД
+    включительно.
+    """
+    kind = request.GET.get('kind', 'calls')
+    fmt = request.GET.get('format', 'csv')
+    if kind not in exporter.EXPORTS:
+        return HttpResponseBadRequest('Неизвестный вид выгрузки')
+    if fmt not in exporter.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        date_from = request.GET.get('from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = request.GET.get('to')
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    except ValueError:
+        return HttpResponseBadRequest('Даты указываются в формате ГГГГ-ММ-ДД')
+
+    queryset = exporter.build_queryset(kind, request.GET.get('user'), date_from, date_to)
+    records = exporter.iter_records(kind, queryset)
+    if fmt == 'csv':
+        response = StreamingHttpResponse(exporter.stream_csv(kind, records), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(exporter.stream_jsonl(records), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
 # ========== СПРАВОЧНИК ==========
 
 @login_required
+@read_connection
 def help_index(request):
-    topics = HelpTopic.objects.filter(is_active=True).prefetch_related('tabs').order_by('order')
-    return render(request, 'help/index.html', {'topics': topics})
+    # Аккордеон тем берётся из кэша по версии справочника, без запросов к БД
+    return render(request, 'help/index.html', {'accordion_html': render_help_accordion()})
+
+
+@login_required
+def help_search(request):
+    """Поиск по справочнику: вкладки по релевантности с подсвеченным фрагментом."""
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'query': query, 'results': helpsearch.search(query)})
 
 
 @staff_member_required
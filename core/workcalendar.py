@@ -0,0 +1,121 @@
+"""
+Рабочий календарь оператора.
+
+По типу графика и первому рабочему дню заранее строится битовая карта
+рабочих дней на скользящее окно лет (WORK_CALENDAR_YEARS вперёд от
+прошлого года) и массив «ближайший рабочий день не раньше i». Проверка
+дня и поиск следующего рабочего дня – обращение к массиву.
+
+Календари одинаковых графиков общие для всех пользователей и живут в
+LRU-кэше. Ключ кэша – сами параметры графика, поэтому после изменения
+настроек пользователь сразу получает новый календарь, а со сменой года
+окно сдвигается.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def is_working_by_rule(schedule_type, anchor, day):
+    """Рабочий ли день по правилу графика (без календаря)."""
+    if schedule_type == '5/2':
+        return day.weekday() < 5
+    if schedule_type == '2/2':
+        return (day - anchor).days % 4 in (0, 1)
+    return True  # индивидуальный – все дни рабочие
+
+
+class WorkCalendar:
+    """Рабочие дни графика в окне [start, end)."""
+
+    def __init__(self, schedule_type, anchor, start, end):
+        self.schedule_type = schedule_type
+        self.anchor = anchor
+        self.start = start
+        self.size = (end - start).days
+
+        self.bits = bytearray((self.size + 7) // 8)
+        for i in range(self.size):
+            if is_working_by_rule(schedule_type, anchor, start + timedelta(days=i)):
+                self.bits[i >> 3] |= 1 << (i & 7)
+
+        # next_index[i] – индекс ближайшего рабочего дня >= i; size – таких нет
+        self.next_index = array('l', [self.size]) * (self.size + 1)
+        for i in range(self.size - 1, -1, -1):
+            self.next_index[i] = i if self._bit(i) else self.next_index[i + 1]
+
+    def _bit(self, i):
+        return self.bits[i >> 3] >> (i & 7) & 1
+
+    def is_working(self, day):
+        i = (day - self.start).days
+        if 0 <= i < self.size:
+            return bool(self._bit(i))
+        return is_working_by_rule(self.schedule_type, self.anchor, day)
+
+    def next_working_day(self, day):
+        """Ближайший рабочий день не раньше day."""
+        i = (day - self.start).days
+        if 0 <= i < self.size and self.next_index[i] < self.size:
+            return self.start + timedelta(days=self.next_index[i])
+        # За пределами окна – перебор (у всех графиков не больше пары дней)
+        for offset in range(7):
+            candidate = day + timedelta(days=offset)
+            if is_working_by_rule(self.schedule_type, self.anchor, candidate):
+                return candidate
+        return day
+
+    def next_working_minute(self, dt):
+        """
+        Ближайший момент рабочего времени не раньше dt: рабочий день и
+        часы WORK_DAY_START..WORK_DAY_END по местному времени.
+        """
+        local = timezone.localtime(dt)
+        day = local.date()
+        day_start, day_end = _work_hours()
+        if self.is_working(day) and day_start <= local.time() < day_end:
+            return dt
+        if not (self.is_working(day) and local.time() < day_start):
+            day = self.next_working_day(day + timedelta(days=1))
+        return timezone.make_aware(datetime.combine(day, day_start), timezone.get_current_timezone())
+
+
+def _work_hours():
+    return _parse_work_hours(settings.WORK_DAY_START, settings.WORK_DAY_END)
+
+
+@lru_cache(maxsize=8)
+def _parse_work_hours(start, end):
+    return datetime.strptime(start, '%H:%M').time(), datetime.strptime(end, '%H:%M').time()
+
+
+@lru_cache(maxsize=256)
+def _build_calendar(schedule_type, anchor, start_year, years):
+    return WorkCalendar(schedule_type, anchor, date(start_year, 1, 1), date(start_year + 1 + years, 1, 1))
+
+
+def get_work_calendar(schedule_type, first_work_date=None, month_start=None):
+    """
+    Календарь графика на окно от 1 января прошлого года. Для 2/2 без
+    первого рабочего дня цикл отсчитывается от month_start (по умолчанию –
+    1-е число текущего месяца), как и раньше в календаре на вкладке.
+    """
+    today = timezone.localdate()
+    anchor = None
+    if schedule_type == '2/2':
+        anchor = first_work_date or month_start or today.replace(day=1)
+    return _build_calendar(schedule_type, anchor, today.year - 1, settings.WORK_CALENDAR_YEARS)
+
+
+def shift_to_work_time(user_settings, dt):
+    """
+    Переносит время перезвона на рабочее время оператора, если он это
+    включил в настройках; иначе возвращает dt без изменений.
+    """
+    if dt is None or not user_settings.callbacks_in_work_time:
+        return dt
+    calendar = get_work_calendar(user_settings.schedule_type, user_settings.first_work_date)
+    return calendar.next_working_minute(dt)
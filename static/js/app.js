@@ -258,7 +258,7 @@ window.handleNedozvon = function(callId, notificationId) {
     $.post('/api/calls/update/', {id: callId})
         .done(function() {
             window.closeNotification(notificationId);
-            if (typeof loadCalls === 'function') loadCalls();
+            if (typeof syncCalls === 'function') syncCalls();
         })
         .fail(function(xhr) {
             alert('Ошибка: ' + xhr.responseText);
@@ -270,8 +270,8 @@ window.handleDozvon = function(callId, notificationId) {
         $.post('/api/calls/complete/', {id: callId})
             .done(function() {
                 window.closeNotification(notificationId);
-                if (typeof loadCalls === 'function') loadCalls();
-                if (typeof loadTracking === 'function') loadTracking();
+                if (typeof syncCalls === 'function') syncCalls();
+                if (typeof syncTracking === 'function') syncTracking();
             })
             .fail(function(xhr) {
                 alert('Ошибка: ' + xhr.responseText);
@@ -283,7 +283,7 @@ window.handlePostpone = function(callId, notificationId) {
     $.post('/api/calls/postpone/', {id: callId})
         .done(function() {
             window.closeNotification(notificationId);
-            if (typeof loadCalls === 'function') loadCalls();
+            if (typeof syncCalls === 'function') syncCalls();
         })
         .fail(function(xhr) {
             alert('Ошибка: ' + xhr.responseText);
@@ -299,23 +299,69 @@ window.closeNotification = function(id) {
     }
 };
 
-// ---------- ПРОВЕРКА НОВЫХ УВЕДОМЛЕНИЙ ----------
+// ---------- ПОКАЗ ПАЧКИ УВЕДОМЛЕНИЙ ----------
+function handleNotifications(data) {
+    if (data && Array.isArray(data.notifications)) {
+        data.notifications.forEach(function(call) {
+            setTimeout(function() {
+                window.showNotification(call);
+            }, 0);
+        });
+    }
+}
+
+// ---------- ПРОВЕРКА НОВЫХ УВЕДОМЛЕНИЙ (ОПРОС) ----------
 function checkNotifications() {
     $.get('/api/notifications/')
-        .done(function(data) {
-            if (data && Array.isArray(data.notifications)) {
-                data.notifications.forEach(function(call) {
-                    setTimeout(function() {
-                        window.showNotification(call);
-                    }, 0);
-                });
-            }
-        })
+        .done(handleNotifications)
         .fail(function(xhr) {
             console.error('Ошибка проверки уведомлений:', xhr.responseText);
         });
 }
 
+// ---------- ЗАПАСНОЙ ВАРИАНТ: ОПРОС КАЖДЫЕ 2 СЕКУНДЫ ----------
+let notificationPollTimer = null;
+
+function startNotificationPolling() {
+    if (notificationPollTimer) return;
+    checkNotifications();
+    notificationPollTimer = setInterval(checkNotifications, 2000);
+}
+
+// ---------- ПОТОК УВЕДОМЛЕНИЙ (SERVER-SENT EVENTS) ----------
+// Сервер держит соединение и присылает событие только когда звонок
+// становится просроченным. Если поток недоступен или выключен на сервере
+// (ответ 204 закрывает EventSource) – переходим на опрос.
+const MAX_STREAM_FAILURES = 3;
+
+function startNotificationStream() {
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+    let failures = 0;
+    const source = new EventSource('/api/notifications/stream/');
+
+    source.addEventListener('open', function() {
+        failures = 0;
+    });
+    source.addEventListener('notifications', function(e) {
+        try {
+            handleNotifications(JSON.parse(e.data));
+        } catch (err) {
+            console.error('Некорректное событие уведомлений:', err);
+        }
+    });
+    source.addEventListener('error', function() {
+        failures++;
+        if (source.readyState === EventSource.CLOSED || failures >= MAX_STREAM_FAILURES) {
+            console.warn('Поток уведомлений недоступен, переходим на опрос');
+            source.close();
+            startNotificationPolling();
+        }
+    });
+}
+
 // ---------- ЗАГРУЗКА ВКЛАДОК ----------
 function loadTab(tabName) {
     $.ajax({
@@ -350,9 +396,8 @@ $(document).ready(function() {
     
     loadTab('calls');
     
-    // Проверка уведомлений каждые 5 секунд (синхронизация со статусом)
-    checkNotifications();
-    setInterval(checkNotifications, 2000); // изменено с 30000 на 5000
+    // Уведомления: поток SSE, при недоступности – опрос каждые 2 секунды
+    startNotificationStream();
 });
 
 // ---------- ОБНОВЛЕНИЕ ГЛОБАЛЬНЫХ НАСТРОЕК ----------